@@ -1,113 +1,214 @@
+import os
+import time
+import uuid
+
 import streamlit as st
-import math
 
-# ----- Data Tables -----
-EP_COST_TABLE = [1, 1, 2, 3, 4, 5, 7, 9, 11, 14, 17, 20, 23, 26]
-CONTROL_REDUCTION_TABLE = [i * 0.5 for i in range(14)]
-BUFF_DEBUFF_TABLE = [i * 3 for i in range(19)]
-ENDURANCE_TO_MAX_EP = [20 + i * 10 for i in range(14)]
+from StaminaAfford import AFFORDABLE_STATS, max_affordable_level, max_affordable_uses
+from StaminaCache import cached_breakdown
+from StaminaCompare import MAX_CANDIDATES, compare_loadouts
+from StaminaDistribution import dice_distribution, ep_distributions
+from StaminaEncounter import Encounter
+from StaminaEngine import Loadout, fast_forward, max_ep_for
+from StaminaFrontier import load_frontier
+from StaminaHistory import TurnHistory, history_chart, init_history, record_turn, reset_history
+from StaminaMetrics import next_turn_clicks, reruns, reset_clicks, start_metrics_server, track_session
+from StaminaPlan import evaluate_plans
+from StaminaPlugins import TurnState, cost_rules, load_plugins, plugin_errors, run_cost_rules
+from StaminaRest import REST_LENGTHS, SECONDS_PER_TURN, rest, rest_turns, turns_to_full
+from StaminaRules import current_rules, last_rules_error
+from StaminaSessions import manage_session, restore_session
+from StaminaSnapshot import decode_snapshot, encode_snapshot, fit_loadout, snapshot_from_text, snapshot_to_text
+from StaminaTrace import emit_span
+
+# ----- Snapshots -----
+# Loadout field -> widget key, so a snapshot can put the sliders back
+WIDGET_KEYS = {
+    "endurance": "endurance",
+    "power1": "Power Use 1", "power1_inactive": "inactive_Power Use 1",
+    "power2": "Power Use 2", "power2_inactive": "inactive_Power Use 2",
+    "range_stat": "Range", "range_inactive": "inactive_Range",
+    "control": "Control", "control_inactive": "inactive_Control",
+    "mobility_stat": "Mobility", "mobility_inactive": "inactive_Mobility",
+    "buff_debuff": "buff_debuff",
+    "extra_costs": "extra_costs",
+    "upkeep1": "upkeep1", "upkeep2": "upkeep2", "upkeep_buff": "upkeep_buff",
+    "deactivated_regen": "deactivated_regen",
+}
+
+# Kept by the session manager (see StaminaSessions.py): spilled to disk when
+# the tab sits idle and restored when the player comes back
+SESSION_KEYS = (
+    "current_ep", "turn_count", "trace_id", "ep_history",
+    "candidates", "candidates_version", "encounter", "encounter_message", "snapshot_error",
+    "snapshot_warning",
+)
+SESSION_WIDGET_KEYS = (*WIDGET_KEYS.values(), "advance_turns", "afford_turns", "rest_kind", "rest_minutes")
+
+def apply_snapshot(code):
+    snapshot = decode_snapshot(snapshot_from_text(code))
+    # Levels past the sliders' range would stop the page, so they are lowered to it
+    loadout, lowered = fit_loadout(snapshot["loadout"], current_rules())
+    st.session_state.snapshot_warning = (
+        f"Snapshot levels above the current rules' caps were lowered: {', '.join(lowered)}" if lowered else None
+    )
+    st.session_state.current_ep = snapshot["current_ep"]
+    st.session_state.turn_count = snapshot["turn_count"]
+    for field, key in WIDGET_KEYS.items():
+        st.session_state[key] = getattr(loadout, field)
+
+    rows = snapshot["history"]
+    if rows:
+        st.session_state.ep_history = TurnHistory()
+        for turn, regen, cost, ep_after in rows:
+            st.session_state.ep_history.append(turn, regen, cost, ep_after)
+    else:
+        reset_history(snapshot["current_ep"], snapshot["turn_count"])
+
+def load_snapshot_code():
+    restore_session()
+    try:
+        apply_snapshot(st.session_state.snapshot_code)
+        st.session_state.snapshot_error = None
+    except ValueError as err:
+        st.session_state.snapshot_error = str(err)
 
 # ----- Session State Initialization -----
+manage_session(
+    SESSION_KEYS, (*SESSION_WIDGET_KEYS, *(key for key in st.session_state if str(key).startswith("rule_")))
+)
 if "current_ep" not in st.session_state:
     st.session_state.current_ep = 70
+    # A browser refresh starts a new session; pick the encounter back up from the URL
+    if "snapshot" in st.query_params:
+        try:
+            apply_snapshot(st.query_params["snapshot"])
+        except ValueError:
+            pass
 if "turn_count" not in st.session_state:
     st.session_state.turn_count = 1
+if "trace_id" not in st.session_state:
+    # Tags this session's turn spans in stamina_trace.log
+    st.session_state.trace_id = uuid.uuid4().hex
+init_history(st.session_state.current_ep, st.session_state.turn_count)
+
+# ----- Metrics -----
+# Scraped from http://127.0.0.1:9464/metrics (see StaminaMetrics.py)
+SCRIPT_NAME = os.path.basename(__file__)
+start_metrics_server()
+reruns.inc(SCRIPT_NAME)
+track_session(st.session_state)
 
 # ----- Title -----
 st.title("Anthesis EP Calculator")
 
+# Filled in once the whole loadout and current EP are known
+afford_slots = {}
+
 def stat_slider_with_inactive(label, min_val, max_val, default_val, allow_inactive=True):
     col1, col2 = st.sidebar.columns([4,1])
     with col1:
-        val = st.slider(label, min_val, max_val, default_val)
+        val = st.slider(label, min_val, max_val, default_val, key=label)
+        if label in AFFORDABLE_STATS:
+            afford_slots[label] = st.empty()
     inactive = False
     if allow_inactive:
         with col2:
             inactive = st.checkbox("Inactive", key=f"inactive_{label}")
     return (val, inactive)
 
+def param_widget(rule_name, param, default):
+    # A homebrew rule's param, as the widget its default's type calls for
+    key = f"rule_{rule_name}_{param}"
+    label = param.replace("_", " ").capitalize()
+    if isinstance(default, bool):
+        return st.checkbox(label, value=default, key=key)
+    if isinstance(default, (list, tuple)):
+        return st.selectbox(label, list(default), key=key)
+    if isinstance(default, int):
+        return st.number_input(label, value=default, step=1, key=key)
+    return st.number_input(label, value=float(default), step=0.25, key=key)
+
+# ----- Rules -----
+# Loaded from stamina_rules.toml; edits there apply on the next rerun
+rules = current_rules()
+if last_rules_error():
+    st.warning(f"Rules file not reloaded, still using version {rules.version}: {last_rules_error()}")
+
 # ----- Sidebar Inputs -----
-endurance = st.sidebar.slider("Endurance", 0, 13, 5)
+endurance = st.sidebar.slider("Endurance", 0, rules.max_endurance, 5, key="endurance")
 
-power1, power1_inactive = stat_slider_with_inactive("Power Use 1", 0, 13, 4)
-power2, power2_inactive = stat_slider_with_inactive("Power Use 2", 0, 13, 2)
-range_stat, range_inactive = stat_slider_with_inactive("Range", 0, 13, 3)
-control, control_inactive = stat_slider_with_inactive("Control", 0, 13, 4)
-mobility_stat, mobility_inactive = stat_slider_with_inactive("Mobility", 0, 13, 3)
-buff_debuff = st.sidebar.slider("Stat Buff/Debuff", 0, 18, 0)
+power1, power1_inactive = stat_slider_with_inactive("Power Use 1", 0, rules.max_stat, 4)
+power2, power2_inactive = stat_slider_with_inactive("Power Use 2", 0, rules.max_stat, 2)
+range_stat, range_inactive = stat_slider_with_inactive("Range", 0, rules.max_stat, 3)
+control, control_inactive = stat_slider_with_inactive("Control", 0, rules.max_stat, 4)
+mobility_stat, mobility_inactive = stat_slider_with_inactive("Mobility", 0, rules.max_stat, 3)
+buff_debuff = st.sidebar.slider("Stat Buff/Debuff", 0, rules.max_buff, 0, key="buff_debuff")
 
-extra_costs = st.sidebar.number_input("Extra Costs (can be negative)", value=0.0, step=0.5)
-upkeep1 = st.sidebar.checkbox("Upkeep for Power Use 1 (halve cost)", value=False)
-upkeep2 = st.sidebar.checkbox("Upkeep for Power Use 2 (halve cost)", value=False)
-upkeep_buff = st.sidebar.checkbox("Upkeep for Buff/Debuff (halve cost)", value=False)
-deactivated_regen = st.sidebar.checkbox("Deactivated Regen (regen every turn)", value=False)
+extra_costs = st.sidebar.number_input("Extra Costs (can be negative)", value=0.0, step=0.5, key="extra_costs")
+upkeep1 = st.sidebar.checkbox("Upkeep for Power Use 1 (halve cost)", value=False, key="upkeep1")
+upkeep2 = st.sidebar.checkbox("Upkeep for Power Use 2 (halve cost)", value=False, key="upkeep2")
+upkeep_buff = st.sidebar.checkbox("Upkeep for Buff/Debuff (halve cost)", value=False, key="upkeep_buff")
+deactivated_regen = st.sidebar.checkbox("Deactivated Regen (regen every turn)", value=False, key="deactivated_regen")
+
+# ----- Homebrew Costs -----
+# Cost rules from plugin modules (see StaminaPlugins.py); enabled ones add to Extra Costs
+load_plugins()
+enabled_rules, rule_params = [], {}
+with st.sidebar.expander("Homebrew Costs"):
+    for module, error in plugin_errors.items():
+        st.warning(f"Plugin {module} not loaded: {error}")
+    for rule in cost_rules.values():
+        if st.checkbox(rule.name, key=f"rule_{rule.name}", help=rule.help or None):
+            enabled_rules.append(rule.name)
+            rule_params[rule.name] = {
+                param: param_widget(rule.name, param, default) for param, default in rule.params.items()
+            }
+    if not cost_rules:
+        st.caption("No homebrew rules loaded")
+
+loadout = Loadout(
+    endurance, power1, power1_inactive, power2, power2_inactive,
+    range_stat, range_inactive, control, control_inactive,
+    mobility_stat, mobility_inactive, buff_debuff, extra_costs,
+    upkeep1, upkeep2, upkeep_buff, deactivated_regen,
+)
 
 # ----- Max EP -----
-max_ep = ENDURANCE_TO_MAX_EP[endurance]
+max_ep = max_ep_for(endurance)
 
 # ----- Reset Button -----
 if st.sidebar.button("Reset"):
+    reset_clicks.inc(SCRIPT_NAME)
     st.session_state.turn_count = 0
     st.session_state.current_ep = max_ep
-
-# ----- Control Reduction -----
-control_reduction = 0 if control_inactive else CONTROL_REDUCTION_TABLE[control]
-
-# ----- EP Cost Function (non-mobility) -----
-def compute_stat_cost(stat_val, inactive, apply_upkeep=False):
-    if inactive:
-        return 0
-    cost = EP_COST_TABLE[stat_val]
-    if apply_upkeep:
-        cost /= 2
-    cost -= control_reduction
-    cost = max(cost, 0)
-
-    frac = cost % 1
-    if frac in [0.25, 0.75]:
-        cost = math.ceil(cost * 2) / 2
-
-    return max(cost, 1)
-
-# ----- EP Cost Function for Mobility -----
-def compute_mobility_cost(stat_val, inactive):
-    if inactive:
-        return 0
-    cost = EP_COST_TABLE[stat_val]
-    cost -= control_reduction
-    cost = max(cost, 0)
-    cost /= 2
-    return max(round(cost), 1)
-
-# ----- Buff/Debuff Cost -----
-def compute_buff_cost(buff_val, upkeep=False):
-    cost = BUFF_DEBUFF_TABLE[buff_val]
-    if cost == 0:
-        return 0
-    if upkeep:
-        cost /= 2
-    return math.ceil(cost)
+    reset_history(max_ep)
 
 # ----- Calculate All Costs -----
-ep_power1 = compute_stat_cost(power1, power1_inactive, apply_upkeep=upkeep1)
-ep_power2 = compute_stat_cost(power2, power2_inactive, apply_upkeep=upkeep2)
-ep_range = compute_stat_cost(range_stat, range_inactive)
-ep_mobility = compute_mobility_cost(mobility_stat, mobility_inactive)
-buff_debuff_cost = compute_buff_cost(buff_debuff, upkeep_buff)
-
-# ----- Total Cost (add up everything) -----
-raw_total = ep_power1 + ep_power2 + ep_range + ep_mobility + buff_debuff_cost + extra_costs
-
-# Round only if total ends in .25 or .75
-remainder = raw_total % 1
-if remainder in [0.25, 0.75]:
-    total_cost = math.ceil(raw_total * 2) / 2
-else:
-    total_cost = raw_total
-
-# Final min 1 unless total is exactly 0
-if total_cost > 0:
-    total_cost = max(total_cost, 1)
+# Shared across sessions: identical loadouts are priced once per server
+cost_started = time.perf_counter_ns()
+breakdown = cached_breakdown(loadout)
+regen_turn = deactivated_regen or (st.session_state.turn_count % 2 == 0)
+# Homebrew rules see the loadout and the turn, then their EP is folded into
+# Extra Costs and priced again, so rounding applies to the sum
+turn_state = TurnState(
+    st.session_state.turn_count, st.session_state.current_ep, max_ep, regen_turn, breakdown["total_cost"]
+)
+homebrew_costs, homebrew_errors = run_cost_rules(loadout, turn_state, enabled_rules, rule_params)
+homebrew_total = sum(homebrew_costs.values())
+priced_loadout = loadout._replace(extra_costs=extra_costs + homebrew_total) if homebrew_total else loadout
+if homebrew_total:
+    breakdown = cached_breakdown(priced_loadout)
+cost_ns = time.perf_counter_ns() - cost_started
+for name, error in homebrew_errors.items():
+    st.warning(f"Homebrew rule {name} failed and counts as 0 EP: {error}")
+control_reduction = breakdown["control_reduction"]
+ep_power1 = breakdown["ep_power1"]
+ep_power2 = breakdown["ep_power2"]
+ep_range = breakdown["ep_range"]
+ep_mobility = breakdown["ep_mobility"]
+buff_debuff_cost = breakdown["buff_debuff_cost"]
+total_cost = breakdown["total_cost"]
 
 # ----- Turn Management -----
 st.sidebar.header("Turn Management")
@@ -118,38 +219,450 @@ starting_ep = st.sidebar.number_input(
     step=1.0
 )
 
-regen_turn = deactivated_regen or (st.session_state.turn_count % 2 == 0)
 regen_amount = int(round(max_ep * 0.10)) if regen_turn else 0
 
 if st.sidebar.button("Next Turn"):
+    next_turn_clicks.inc(SCRIPT_NAME)
+    started_ns = time.time_ns()
+    turn_started = time.perf_counter_ns()
+    ep_before = st.session_state.current_ep
     new_ep = st.session_state.current_ep + regen_amount
+    ep_after_regen = new_ep
     new_ep = min(new_ep, max_ep)
+    ep_after_max_clamp = new_ep
     new_ep -= total_cost
+    ep_after_cost = new_ep
     new_ep = max(0, new_ep)
     st.session_state.current_ep = new_ep
     st.session_state.turn_count += 1
+    # History keeps the regen EP actually took, after the max clamp
+    record_turn(new_ep, st.session_state.turn_count, max(0, ep_after_max_clamp - ep_before), total_cost)
+    emit_span(
+        "next_turn", st.session_state.trace_id, started_ns, time.perf_counter_ns() - turn_started, loadout,
+        turn=st.session_state.turn_count - 1, max_ep=max_ep, regen_turn=regen_turn, regen_amount=regen_amount,
+        total_cost=total_cost, ep_before=ep_before, ep_after_regen=ep_after_regen,
+        ep_after_max_clamp=ep_after_max_clamp, ep_after_cost=ep_after_cost, ep_after=new_ep,
+        homebrew=homebrew_costs, cost_us=cost_ns / 1000,
+    )
+
+# ----- Fast Forward -----
+# Same result as pressing Next Turn that many times, worked out in one step
+MAX_ADVANCE_TURNS = 10 ** 6
+advance_turns = st.sidebar.number_input(
+    "Turns to advance", min_value=1, max_value=MAX_ADVANCE_TURNS, value=10, step=1, key="advance_turns"
+)
+if st.sidebar.button("Advance Turns"):
+    started_ns = time.time_ns()
+    turn_started = time.perf_counter_ns()
+    ep_before = st.session_state.current_ep
+    result = fast_forward(
+        st.session_state.current_ep, st.session_state.turn_count,
+        max_ep, total_cost, advance_turns, deactivated_regen,
+    )
+    emit_span(
+        "advance_turns", st.session_state.trace_id, started_ns, time.perf_counter_ns() - turn_started, loadout,
+        turn=st.session_state.turn_count, turns=advance_turns, max_ep=max_ep, total_cost=total_cost,
+        ep_before=ep_before, ep_after=result["current_ep"], regen_gained=result["regen_gained"],
+        regen_applied=result["regen_applied"],
+        exhausted_turn=result["exhausted_turn"], exhausted_turns=result["exhausted_turns"],
+        cost_us=cost_ns / 1000,
+    )
+    st.session_state.current_ep = result["current_ep"]
+    st.session_state.turn_count = result["turn_count"]
+    record_turn(result["current_ep"], result["turn_count"], result["regen_applied"], total_cost * advance_turns)
+    if result["exhausted_turn"] is None:
+        st.sidebar.success(f"Advanced {advance_turns} turns without running out of EP")
+    else:
+        st.sidebar.warning(
+            f"Out of EP from turn {result['exhausted_turn']} "
+            f"({result['exhausted_turns']} of {advance_turns} turns not fully paid)"
+        )
+
+# ----- Rest -----
+# Restores this loadout and everyone in the encounter tracker at once, in closed form
+st.sidebar.header("Rest")
+rest_kind = st.sidebar.selectbox("Rest length", [*REST_LENGTHS, "Custom"], key="rest_kind")
+if rest_kind in REST_LENGTHS:
+    rest_minutes = REST_LENGTHS[rest_kind]
+else:
+    rest_minutes = st.sidebar.number_input("Rest minutes", min_value=1, value=10, step=1, key="rest_minutes")
+if st.sidebar.button("Take Rest"):
+    started_ns = time.time_ns()
+    turn_started = time.perf_counter_ns()
+    ep_before = st.session_state.current_ep
+    rested_turns = rest_turns(rest_minutes)
+    result = rest(st.session_state.current_ep, st.session_state.turn_count, max_ep, rested_turns, deactivated_regen)
+    st.session_state.current_ep = result["current_ep"]
+    st.session_state.turn_count = result["turn_count"]
+    record_turn(result["current_ep"], result["turn_count"], result["recovered"], 0)
+    party = st.session_state.get("encounter")
+    party_rested = party.rest(rested_turns) if party is not None else {}
+    emit_span(
+        "rest", st.session_state.trace_id, started_ns, time.perf_counter_ns() - turn_started, loadout,
+        turn=st.session_state.turn_count - rested_turns, turns=rested_turns, minutes=rest_minutes, max_ep=max_ep,
+        ep_before=ep_before, ep_after=result["current_ep"], regen_gained=result["regen_gained"],
+        party_recovered=party_rested,
+    )
+    party_text = f"; {len(party_rested)} in the encounter rested too" if party_rested else ""
+    st.sidebar.success(f"Rested {rested_turns} turns: +{result['recovered']} EP{party_text}")
+full_in = turns_to_full(st.session_state.current_ep, st.session_state.turn_count, max_ep, deactivated_regen)
+if full_in is None:
+    st.sidebar.caption("No regen at this Endurance, so resting restores nothing")
+elif full_in:
+    st.sidebar.caption(f"Full EP after {full_in} turns of rest ({full_in * SECONDS_PER_TURN / 60:g} min)")
+
+# ----- Max Affordable -----
+# Shown under each stat slider: highest level and most uses per turn the current EP can pay for
+afford_turns = st.sidebar.number_input("Affordable over turns", min_value=1, value=1, step=1, key="afford_turns")
+for label, slot in afford_slots.items():
+    level = max_affordable_level(
+        label, priced_loadout, st.session_state.current_ep, st.session_state.turn_count, afford_turns, rules=rules
+    )
+    uses = max_affordable_uses(
+        label, priced_loadout, st.session_state.current_ep, st.session_state.turn_count, afford_turns, rules=rules
+    )
+    level_text = "none" if level is None else f"{level} (max)" if level == rules.max_stat else str(level)
+    uses_text = "none" if uses is None else "no limit" if uses == float("inf") else str(uses)
+    slot.caption(f"Max affordable: level {level_text} · {uses_text} uses per turn")
 
 remaining_ep = st.session_state.current_ep - total_cost
 
 # ----- Display -----
 st.subheader("EP Breakdown")
 
-st.write(f"**Max EP** (Endurance {endurance}): {max_ep}")
-st.write(f"**Current EP** (Turn {st.session_state.turn_count}): {st.session_state.current_ep}")
-
-st.write(f"**Power Use 1 Cost** (Inactive: {power1_inactive}, Upkeep: {upkeep1}): {ep_power1}")
-st.write(f"**Power Use 2 Cost** (Inactive: {power2_inactive}, Upkeep: {upkeep2}): {ep_power2}")
-st.write(f"**Range Cost** (Inactive: {range_inactive}): {ep_range}")
-st.write(f"**Mobility Cost** (Inactive: {mobility_inactive}): {ep_mobility}")
-st.write(f"**Buff/Debuff Cost** (Upkeep: {upkeep_buff}): {buff_debuff_cost}")
-st.write(f"**Control Reduction** (Inactive: {control_inactive}): {control_reduction}")
-st.write(f"**Extra Costs**: {extra_costs}")
-
-st.write(f"**Total EP Cost (after rounding rules)**: {total_cost}")
-st.write(f"**Stamina Regen this turn:** {regen_amount}")
-st.write(f"**Remaining EP After Action**: {remaining_ep}")
+# One table element rather than a write per line: a rerun sends one delta,
+# and with minCachedMessageSize lowered in .streamlit/config.toml an
+# unchanged table is sent as a hash the browser already has
+breakdown_rows = [
+    ("Max EP", f"Endurance {endurance}", max_ep),
+    ("Current EP", f"Turn {st.session_state.turn_count}", st.session_state.current_ep),
+    ("Power Use 1 Cost", f"Inactive: {power1_inactive}, Upkeep: {upkeep1}", ep_power1),
+    ("Power Use 2 Cost", f"Inactive: {power2_inactive}, Upkeep: {upkeep2}", ep_power2),
+    ("Range Cost", f"Inactive: {range_inactive}", ep_range),
+    ("Mobility Cost", f"Inactive: {mobility_inactive}", ep_mobility),
+    ("Buff/Debuff Cost", f"Upkeep: {upkeep_buff}", buff_debuff_cost),
+    ("Control Reduction", f"Inactive: {control_inactive}", control_reduction),
+    ("Extra Costs", "", extra_costs),
+    *((f"Homebrew: {name}", "", amount) for name, amount in homebrew_costs.items()),
+    ("Total EP Cost", "after rounding rules", total_cost),
+    ("Stamina Regen", "this turn", regen_amount),
+    ("Remaining EP", "after action", remaining_ep),
+]
+st.markdown(
+    "| | | EP |\n|---|---|---:|\n"
+    + "\n".join(f"| **{name}** | {detail} | {value} |" for name, detail, value in breakdown_rows)
+)
 
 if remaining_ep < 0:
     st.error("⚠️ You do not have enough EP for this action!")
 else:
     st.success("✅ EP is sufficient for this action.")
+
+# ----- EP History -----
+st.subheader("EP History")
+history_chart()
+
+# ----- Random Extra Costs -----
+st.subheader("Random Extra Costs")
+dice_spec = st.text_input("Dice added to Extra Costs each turn (e.g. 1d6, 2d4+1)", value="")
+if dice_spec.strip():
+    horizon = st.slider("Turns ahead", 1, 100, 10)
+    try:
+        extra_distribution = {
+            extra_costs + homebrew_total + roll: p for roll, p in dice_distribution(dice_spec).items()
+        }
+        forecast = ep_distributions(
+            loadout, extra_distribution, horizon,
+            current_ep=st.session_state.current_ep,
+            turn_count=st.session_state.turn_count,
+        )
+    except ValueError as err:
+        st.error(f"⚠️ {err}")
+    else:
+        out_chance = forecast["out_of_ep_by_turn"]
+        st.write(f"**Chance to be out of EP by turn {st.session_state.turn_count + horizon - 1}:** {out_chance[-1]:.1%}")
+        st.line_chart({
+            "Turn": [st.session_state.turn_count + k for k in range(horizon)],
+            "Chance Out of EP": out_chance,
+        }, x="Turn")
+
+# ----- Encounter Plans -----
+st.subheader("Encounter Plans")
+plan_text = st.text_area(
+    "One plan per line, e.g. turns 1-3: Power Use 1 at 6 with upkeep; turn 4: Mobility inactive, extra 2.5",
+    value="",
+)
+if plan_text.strip():
+    try:
+        plan_results = evaluate_plans(
+            [line for line in plan_text.splitlines() if line.strip()],
+            base=priced_loadout,
+            current_ep=st.session_state.current_ep,
+            turn_count=st.session_state.turn_count,
+        )
+    except ValueError as err:
+        st.error(f"⚠️ {err}")
+    else:
+        st.table([
+            {
+                "Plan": result["text"],
+                "Turns": result["turns"],
+                "EP Spent": result["total_spent"],
+                "Final EP": result["final_ep"],
+                "Lowest EP": result["lowest_ep"],
+                "Out of EP on Turn": result["exhausted_turn"],  # None (empty) when it never runs out
+            }
+            for result in plan_results
+        ])
+
+# ----- Compare Loadouts -----
+st.subheader("Compare Loadouts")
+# Candidates live in a table; the editor key changes when rows are added, so
+# the new rows start clean.  Only edited rows are priced again.
+if "candidates" not in st.session_state:
+    st.session_state.candidates = []
+    st.session_state.candidates_version = 0
+
+CANDIDATE_COLUMNS = {
+    "endurance": st.column_config.NumberColumn("Endurance", min_value=0, max_value=rules.max_endurance, step=1),
+    "power1": st.column_config.NumberColumn("Power Use 1", min_value=0, max_value=rules.max_stat, step=1),
+    "power1_inactive": st.column_config.CheckboxColumn("P1 Inactive"),
+    "upkeep1": st.column_config.CheckboxColumn("P1 Upkeep"),
+    "power2": st.column_config.NumberColumn("Power Use 2", min_value=0, max_value=rules.max_stat, step=1),
+    "power2_inactive": st.column_config.CheckboxColumn("P2 Inactive"),
+    "upkeep2": st.column_config.CheckboxColumn("P2 Upkeep"),
+    "range_stat": st.column_config.NumberColumn("Range", min_value=0, max_value=rules.max_stat, step=1),
+    "range_inactive": st.column_config.CheckboxColumn("Range Inactive"),
+    "control": st.column_config.NumberColumn("Control", min_value=0, max_value=rules.max_stat, step=1),
+    "control_inactive": st.column_config.CheckboxColumn("Control Inactive"),
+    "mobility_stat": st.column_config.NumberColumn("Mobility", min_value=0, max_value=rules.max_stat, step=1),
+    "mobility_inactive": st.column_config.CheckboxColumn("Mobility Inactive"),
+    "buff_debuff": st.column_config.NumberColumn("Buff/Debuff", min_value=0, max_value=rules.max_buff, step=1),
+    "upkeep_buff": st.column_config.CheckboxColumn("Buff Upkeep"),
+    "extra_costs": st.column_config.NumberColumn("Extra Costs", step=0.25),
+    "deactivated_regen": st.column_config.CheckboxColumn("Deactivated Regen"),
+}
+
+edited = st.data_editor(
+    [{field: getattr(candidate, field) for field in CANDIDATE_COLUMNS} for candidate in st.session_state.candidates],
+    column_config=CANDIDATE_COLUMNS,
+    column_order=list(CANDIDATE_COLUMNS),
+    num_rows="dynamic",
+    key=f"candidates_{st.session_state.candidates_version}",
+)
+
+def candidate_from_row(row):
+    # New rows start as the current loadout; the editor hands numbers back as floats
+    values = {}
+    for field in CANDIDATE_COLUMNS:
+        default = getattr(priced_loadout, field)
+        value = row.get(field)
+        values[field] = default if value is None or value != value else type(default)(value)
+    return Loadout(**values)
+
+
+candidates = [candidate_from_row(row) for row in edited][:MAX_CANDIDATES]
+
+if st.button("Add Current Loadout", disabled=len(candidates) >= MAX_CANDIDATES):
+    st.session_state.candidates = candidates + [priced_loadout]
+    st.session_state.candidates_version += 1
+    st.rerun()
+
+if candidates:
+    compared = compare_loadouts([priced_loadout] + candidates, st.session_state.current_ep, st.session_state.turn_count)
+    columns = {"Current": compared[0]}
+    for index, row in enumerate(compared[1:], start=1):
+        columns[f"#{index}"] = row
+    st.table({
+        name: {
+            "Max EP": row["max_ep"],
+            "Power Use 1": row["ep_power1"],
+            "Power Use 2": row["ep_power2"],
+            "Range": row["ep_range"],
+            "Mobility": row["ep_mobility"],
+            "Buff/Debuff": row["buff_debuff_cost"],
+            "Total EP Cost": row["total_cost"],
+            "Turns Before Out of EP": row["turns_until_out"],  # None (empty) when it never runs out
+        }
+        for name, row in columns.items()
+    })
+else:
+    st.caption(f"Add up to {MAX_CANDIDATES} loadouts to compare their costs side by side.")
+
+# ----- Build Advice -----
+# Loadouts no other loadout beats on EP cost, sustained turns and stat total at once
+st.subheader("Build Advice")
+advice_col1, advice_col2 = st.columns(2)
+with advice_col1:
+    advice_max_cost = st.number_input("Max EP cost per turn (0 = any)", min_value=0.0, value=0.0, step=0.5)
+with advice_col2:
+    advice_min_turns = st.number_input("Min turns before out of EP", min_value=0, value=0, step=1)
+frontier = load_frontier()  # built by StaminaWarmup.py or StaminaFrontier.py, never here
+if frontier is None:
+    st.caption("Build advice unavailable: run `python StaminaFrontier.py` to build it for these rules.")
+else:
+    advice = frontier.query(
+        endurance,
+        max_cost=advice_max_cost or None,
+        min_turns=advice_min_turns or None,
+        limit=50,
+    )
+    if advice:
+        st.dataframe([
+            {
+                "Power Use 1": row["power1"],
+                "Power Use 2": row["power2"],
+                "Range": row["range_stat"],
+                "Mobility": row["mobility_stat"],
+                "Control": row["control"],
+                "Stat Total": row["stat_total"],
+                "Total EP Cost": row["total_cost"],
+                "Turns Before Out of EP": row["turns"],
+            }
+            for row in advice
+        ], hide_index=True, column_config={
+            "Turns Before Out of EP": st.column_config.NumberColumn(help="Empty when the loadout never runs out"),
+        })
+    else:
+        st.caption("No loadout on the frontier meets both limits.")
+
+# ----- Encounter Tracker -----
+st.subheader("Encounter Tracker")
+if "encounter" not in st.session_state:
+    st.session_state.encounter = Encounter()
+    st.session_state.encounter_message = None
+encounter = st.session_state.encounter
+
+
+# Callbacks run before the rerun, so the page below shows the new order
+def encounter_step(step, *args):
+    # step names an Encounter method; the encounter is looked up now, since it may have been spilled
+    restore_session()
+    try:
+        result = getattr(st.session_state.encounter, step)(*args)
+        st.session_state.encounter_message = None
+    except ValueError as err:
+        st.session_state.encounter_message = f"⚠️ {err}"
+        return
+    if isinstance(result, dict) and result["exhausted"]:
+        st.session_state.encounter_message = f"⚠️ {result['name']} could not pay {result['cost']} EP"
+
+
+def add_combatant():
+    restore_session()
+    encounter_step(
+        "add",
+        st.session_state.combatant_name.strip() or f"Combatant {len(st.session_state.encounter) + 1}",
+        st.session_state.combatant_initiative,
+        max_ep, total_cost, st.session_state.current_ep, st.session_state.turn_count, deactivated_regen,
+    )
+
+
+col1, col2, col3 = st.columns([3, 1, 1])
+with col1:
+    st.text_input("Combatant name", key="combatant_name")
+with col2:
+    st.number_input("Initiative", value=10, step=1, key="combatant_initiative")
+with col3:
+    st.button("Add Current Loadout", key="add_combatant", on_click=add_combatant)
+
+if len(encounter):
+    actor = encounter.current
+    if actor is None:
+        st.button("Next Actor", on_click=encounter_step, args=("next_actor",))
+    else:
+        st.write(f"**Round {encounter.round}: {actor.name} is up** (EP {actor.current_ep} / {actor.max_ep}, cost {encounter.cost_for(actor)})")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button("Act", on_click=encounter_step, args=("act",))
+        with col2:
+            st.number_input("Delay to initiative", value=actor.initiative - 1, step=1, key="delay_to")
+            st.button("Delay", on_click=lambda: encounter_step("delay", st.session_state.delay_to))
+        with col3:
+            st.button("Ready", on_click=encounter_step, args=("ready",))
+
+    readied = encounter.readied_combatants()
+    if readied:
+        st.selectbox("Readied", [combatant.name for combatant in readied], key="triggered")
+        st.button(
+            "Trigger Readied Action",
+            on_click=lambda: encounter_step("trigger", st.session_state.triggered),
+        )
+
+    if st.session_state.encounter_message:
+        st.error(st.session_state.encounter_message)
+
+    st.table([
+        {
+            "Round": round_number,
+            "Name": combatant.name,
+            "Initiative": combatant.initiative,
+            "EP": f"{combatant.current_ep} / {combatant.max_ep}",
+            "Cost": combatant.total_cost,
+            "Effects Cost": encounter.effects.total_for(combatant.name),
+            "Readied": "yes" if combatant.readied else "",
+        }
+        for round_number, combatant in encounter.upcoming(10)
+    ])
+
+    # Timed buffs/debuffs, priced like the Stat Buff/Debuff slider
+    with st.expander(f"Timed Effects ({len(encounter.effects.effects)} active)"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.selectbox("Target", list(encounter.combatants), key="effect_target")
+            st.text_input("Effect name", value="Buff", key="effect_name")
+            st.checkbox("Upkeep (halve cost)", key="effect_upkeep")
+        with col2:
+            st.slider("Buff/Debuff level", 0, rules.max_buff, 1, key="effect_level")
+            st.number_input("Rounds", min_value=1, value=3, step=1, key="effect_rounds")
+        st.button("Add Effect", on_click=lambda: encounter_step(
+            "add_effect",
+            st.session_state.effect_target, st.session_state.effect_name, st.session_state.effect_level,
+            st.session_state.effect_rounds, st.session_state.effect_upkeep,
+        ))
+        effects = encounter.effects.active()
+        if effects:
+            st.table([
+                {
+                    "Target": effect.target,
+                    "Effect": effect.name,
+                    "Level": effect.level,
+                    "Cost": effect.cost,
+                    "Upkeep": "yes" if effect.upkeep else "",
+                    "Ends Before Round": effect.expires_turn,
+                }
+                for effect in sorted(effects, key=lambda effect: effect.expires_turn)[:50]
+            ])
+
+    st.selectbox("Combatant", list(encounter.combatants), key="removed_combatant")
+    st.button(
+        "Remove from Encounter",
+        on_click=lambda: encounter_step("remove", st.session_state.removed_combatant),
+    )
+
+# ----- Save / Load -----
+# A state the format cannot hold (say a non-finite EP) only loses the
+# snapshot; the URL then drops its stale one rather than restore an older turn
+try:
+    snapshot_code = snapshot_to_text(encode_snapshot(
+        loadout, st.session_state.current_ep, st.session_state.turn_count,
+        st.session_state.ep_history.recent(),
+    ))
+except ValueError as err:
+    snapshot_code, snapshot_problem = None, str(err)
+    st.query_params.pop("snapshot", None)
+else:
+    st.query_params["snapshot"] = snapshot_code
+
+st.sidebar.header("Save / Load")
+if snapshot_code is None:
+    st.sidebar.warning(f"⚠️ This state cannot be saved: {snapshot_problem}")
+else:
+    st.sidebar.code(snapshot_code)
+st.sidebar.text_input("Snapshot code", key="snapshot_code")
+st.sidebar.button("Load Snapshot", on_click=load_snapshot_code)
+if st.session_state.get("snapshot_error"):
+    st.sidebar.error(f"⚠️ {st.session_state.snapshot_error}")
+if st.session_state.get("snapshot_warning"):
+    st.sidebar.warning(f"⚠️ {st.session_state.snapshot_warning}")
+st.sidebar.caption(f"Trace ID: {st.session_state.trace_id}")
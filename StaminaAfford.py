@@ -0,0 +1,92 @@
+import math
+
+from StaminaEngine import DEFAULT_PROFILE, compute_breakdown, compute_total_cost, fast_forward, max_ep_for
+from StaminaRules import current_rules
+
+# The inverse of pricing: given the EP on hand, the highest level of one
+# stat, or the most uses of it, that can still be paid for.
+#
+# Raising one stat's level (or its uses) never lowers the total cost: the
+# rules file keeps ep_cost non-decreasing, scaling only adds, and every
+# rounding step is monotone.  Affordability over k turns is monotone in the
+# cost too, since paying more never leaves more EP for a later turn.  So the
+# answer is a bisection over levels (uses have no cap, so their range is
+# found by doubling first), each probe a compute_breakdown plus an
+# O(1) fast_forward: O(log n) in all, quick enough to show next to every
+# slider on every rerun.
+
+# Stats that can be raised or used, by slider label: level field, inactive field, cost key
+AFFORDABLE_STATS = {
+    "Power Use 1": ("power1", "power1_inactive", "ep_power1"),
+    "Power Use 2": ("power2", "power2_inactive", "ep_power2"),
+    "Range": ("range_stat", "range_inactive", "ep_range"),
+    "Mobility": ("mobility_stat", "mobility_inactive", "ep_mobility"),
+}
+COST_KEYS = ("ep_power1", "ep_power2", "ep_range", "ep_mobility", "buff_debuff_cost", "extra_costs")
+
+
+def bisect_highest(ok, low, high):
+    # Highest x in [low, high] with ok(x), where ok holds up to some point and
+    # fails after it; None if ok(low) already fails
+    if not ok(low):
+        return None
+    while low < high:
+        middle = (low + high + 1) // 2
+        if ok(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def gallop_highest(ok, low):
+    # bisect_highest with no upper end: double a step past low until ok fails,
+    # then bisect the last doubling.  Still O(log x) probes for an answer x.
+    if not ok(low):
+        return None
+    step = 1
+    while ok(low + step):
+        step *= 2
+    return bisect_highest(ok, low + step // 2, low + step - 1)
+
+
+def affordable(total_cost, current_ep, turn_count, max_ep, turns=1, deactivated_regen=False):
+    # True if paying total_cost on each of the next `turns` turns never runs short
+    projection = fast_forward(current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen)
+    return projection["exhausted_turn"] is None
+
+
+def max_affordable_level(label, loadout, current_ep, turn_count, turns=1, profile=DEFAULT_PROFILE, rules=None):
+    # Highest level of the stat (made active) payable on each of the next `turns`
+    # turns, up to the slider cap; None if not even level 0 is
+    rules = rules or current_rules()
+    level_field, inactive_field, _ = AFFORDABLE_STATS[label]
+    max_ep = max_ep_for(loadout.endurance, rules)
+    active = loadout._replace(**{inactive_field: False})
+
+    def ok(level):
+        total = compute_breakdown(active._replace(**{level_field: level}), profile, rules)["total_cost"]
+        return affordable(total, current_ep, turn_count, max_ep, turns, loadout.deactivated_regen)
+
+    return bisect_highest(ok, 0, rules.max_stat)
+
+
+def max_affordable_uses(label, loadout, current_ep, turn_count, turns=1, profile=DEFAULT_PROFILE, rules=None):
+    # Most uses of the stat (made active) per turn, each paying its cost and the
+    # rest of the loadout paid once, for each of the next `turns` turns.  None if
+    # the rest of the loadout alone is already unaffordable; math.inf if a use costs nothing.
+    rules = rules or current_rules()
+    _, inactive_field, cost_key = AFFORDABLE_STATS[label]
+    max_ep = max_ep_for(loadout.endurance, rules)
+    breakdown = compute_breakdown(loadout._replace(**{inactive_field: False}), profile, rules)
+    per_use = breakdown[cost_key]
+    others = sum(breakdown[key] for key in COST_KEYS) - per_use
+
+    def ok(uses):
+        total = compute_total_cost(others + per_use * uses)
+        return affordable(total, current_ep, turn_count, max_ep, turns, loadout.deactivated_regen)
+
+    if per_use == 0:
+        return math.inf if ok(0) else None
+    # Negative Extra Costs can pay for uses past max EP, so the bound is searched for
+    return gallop_highest(ok, 0)
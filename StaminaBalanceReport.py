@@ -0,0 +1,209 @@
+import argparse
+import csv
+import html
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from StaminaCostSpace import mapped_cost_space
+from StaminaEngine import (
+    DEFAULT_LOADOUT,
+    DEFAULT_PROFILE,
+    Loadout,
+    RULE_PROFILES,
+    compute_total,
+    max_ep_for,
+    next_turn,
+    regen_for_turn,
+)
+from StaminaRules import current_rules
+
+# Balance report for every Endurance level.
+#
+#   python StaminaBalanceReport.py [out_dir] [--profile stamina] [--workers N]
+#
+# The sweep covers every listed Power Use 1/2, Range, Mobility and Control level with
+# nothing inactive and no upkeep, buff or extra costs.  Total cost does not
+# depend on Endurance, so the sweep is reduced to a cost histogram first
+# (sharded by Control level), then each Endurance level is simulated in its
+# own worker process against the distinct costs.  Workers price from the
+# mapped cost space, so they share one copy of the tables.
+
+TYPICAL_BUILDS = {
+    "Default": DEFAULT_LOADOUT,
+    "Balanced 3s": Loadout(power1=3, power2=3, range_stat=3, control=3, mobility_stat=3),
+    "Heavy Hitter": Loadout(power1=10, power2_inactive=True, range_stat=5, control=2, mobility_stat=3),
+    "Controller": Loadout(power1=4, power2=4, range_stat=4, control=10, mobility_stat=4),
+    "Upkeep Caster": Loadout(power1=8, upkeep1=True, power2=6, upkeep2=True, range_stat=4, control=4, mobility_stat=2),
+    "Skirmisher": Loadout(power1=5, power2_inactive=True, range_stat=2, control=3, mobility_stat=9),
+}
+
+
+# ----- Simulation -----
+def is_sustainable(max_ep, total_cost, deactivated_regen=False):
+    # Regen keeps up while two turns of cost fit in one regen (every turn with Deactivated Regen)
+    regen = regen_for_turn(max_ep, 0)
+    per_turn = regen if deactivated_regen else regen / 2
+    return total_cost <= min(per_turn, max_ep)
+
+
+def turns_lasted(max_ep, total_cost, deactivated_regen=False):
+    # Turns paid in full from a full EP bar at turn 1; None means never runs out.
+    # Otherwise EP drops every regen cycle, so the loop always ends.
+    if is_sustainable(max_ep, total_cost, deactivated_regen):
+        return None
+    current_ep, turn_count = max_ep, 1
+    paid = 0
+    while True:
+        available = min(current_ep + regen_for_turn(max_ep, turn_count, deactivated_regen), max_ep)
+        if available < total_cost:
+            return paid
+        current_ep, turn_count = next_turn(current_ep, turn_count, max_ep, total_cost, deactivated_regen)
+        paid += 1
+
+
+# ----- Workers -----
+def total_cost_pricer(profile):
+    # Total cost from the mapped cost space, or from the engine without one
+    space = mapped_cost_space()
+    if space is None:
+        return lambda loadout: compute_total(loadout, profile)
+    return lambda loadout: space.total_cost(loadout, profile)
+
+
+def cost_histogram_for_control(args):
+    control, profile = args
+    price = total_cost_pricer(profile)
+    counts = Counter()
+    levels = range(len(current_rules().ep_cost.table))
+    for power1 in levels:
+        for power2 in levels:
+            for range_stat in levels:
+                for mobility_stat in levels:
+                    loadout = Loadout(
+                        power1=power1, power2=power2, range_stat=range_stat,
+                        control=control, mobility_stat=mobility_stat,
+                    )
+                    counts[price(loadout)] += 1
+    return counts
+
+
+def endurance_report(args):
+    endurance, cost_counts, profile = args
+    max_ep = max_ep_for(endurance)
+    regen = regen_for_turn(max_ep, 0)
+
+    lasted = {cost: turns_lasted(max_ep, cost) for cost in cost_counts}
+    total = sum(cost_counts.values())
+    sustainable = sum(count for cost, count in cost_counts.items() if lasted[cost] is None)
+
+    # Highest cost regen still keeps up with
+    break_even = regen / 2
+    break_even_deactivated = regen
+
+    price = total_cost_pricer(profile)
+    builds = {}
+    for name, build in TYPICAL_BUILDS.items():
+        build = build._replace(endurance=endurance)
+        cost = price(build)
+        builds[name] = (cost, turns_lasted(max_ep, cost, build.deactivated_regen))
+
+    return {
+        "endurance": endurance,
+        "max_ep": max_ep,
+        "regen": regen,
+        "break_even_cost": break_even,
+        "break_even_cost_deactivated_regen": break_even_deactivated,
+        "sustainable_share": sustainable / total,
+        "median_turns": median_turns(cost_counts, lasted),
+        "builds": builds,
+    }
+
+
+def median_turns(cost_counts, lasted):
+    # Median over every swept loadout; None when most loadouts are sustainable
+    ordered = sorted(
+        (float("inf") if lasted[cost] is None else lasted[cost], count) for cost, count in cost_counts.items()
+    )
+    half = sum(count for _, count in ordered) / 2
+    seen = 0
+    for turns, count in ordered:
+        seen += count
+        if seen >= half:
+            return None if turns == float("inf") else turns
+    return None
+
+
+# ----- Report -----
+def build_report(profile=DEFAULT_PROFILE, workers=None):
+    rules = current_rules()
+    mapped_cost_space(rules)  # built once here rather than raced by the workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        cost_counts = Counter()
+        for counts in pool.map(cost_histogram_for_control, [(control, profile) for control in range(len(rules.ep_cost.table))]):
+            cost_counts.update(counts)
+        jobs = [(endurance, dict(cost_counts), profile) for endurance in range(len(rules.endurance_to_max_ep.table))]
+        return list(pool.map(endurance_report, jobs))
+
+
+def turns_text(turns):
+    return "sustainable" if turns is None else str(turns)
+
+
+def report_rows(rows):
+    for row in rows:
+        flat = {
+            "Endurance": row["endurance"],
+            "Max EP": row["max_ep"],
+            "Regen (every 2nd turn)": row["regen"],
+            "Break-even Cost": row["break_even_cost"],
+            "Break-even Cost (Deactivated Regen)": row["break_even_cost_deactivated_regen"],
+            "Sustainable Loadouts": f"{row['sustainable_share']:.1%}",
+            "Median Turns Lasted": turns_text(row["median_turns"]),
+        }
+        for name, (cost, turns) in row["builds"].items():
+            flat[f"{name} (cost {cost})"] = turns_text(turns)
+        yield flat
+
+
+def write_csv(rows, path):
+    rows = list(report_rows(rows))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_html(rows, path, profile):
+    rows = list(report_rows(rows))
+    header = "".join(f"<th>{html.escape(name)}</th>" for name in rows[0])
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(value))}</td>" for value in row.values()) + "</tr>"
+        for row in rows
+    )
+    with open(path, "w") as f:
+        f.write(
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<title>EP Balance Report ({html.escape(profile)})</title>"
+            "<style>table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:4px 8px}</style>"
+            f"</head><body><h1>EP Balance Report ({html.escape(profile)} rules)</h1>"
+            f"<p>Rules version {html.escape(current_rules().version)}. "
+            "Turns lasted start from full EP at turn 1. Sustainable loadouts never run out.</p>"
+            f"<table><tr>{header}</tr>{body}</table></body></html>"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EP balance report across all Endurance levels")
+    parser.add_argument("out_dir", nargs="?", default=".")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(RULE_PROFILES))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rows = build_report(args.profile, args.workers)
+    os.makedirs(args.out_dir, exist_ok=True)
+    csv_path = os.path.join(args.out_dir, f"balance_report_{args.profile}.csv")
+    html_path = os.path.join(args.out_dir, f"balance_report_{args.profile}.html")
+    write_csv(rows, csv_path)
+    write_html(rows, html_path, args.profile)
+    print(f"Wrote {csv_path} and {html_path}")
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from StaminaCostSpace import priced_breakdown
+from StaminaEngine import DEFAULT_PROFILE, RULE_PROFILES
+from StaminaMetrics import cost_engine_seconds, watch_cache
+from StaminaRules import current_rules
+
+# Process-wide breakdown cache shared by every session on the server.
+# Streamlit runs sessions on separate threads, so the cache takes a lock.
+# Misses are priced from the mapped cost space.
+
+CACHE_SIZE = 4096
+
+
+class LRUCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        # Compute outside the lock; two threads racing on one key both get the same answer
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def get_many(self, keys, compute_missing):
+        # compute_missing(missing_keys) -> values in the same order, one call for every miss
+        values = {}
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    values[key] = self.entries[key]
+            missing = [key for key in dict.fromkeys(keys) if key not in values]
+            self.misses += len(missing)
+
+        if missing:
+            computed = compute_missing(missing)
+            with self.lock:
+                for key, value in zip(missing, computed):
+                    values[key] = self.entries[key] = value
+                    self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return [values[key] for key in keys]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+breakdown_cache = LRUCache()
+watch_cache("breakdown", breakdown_cache)
+
+
+# ----- Normalization -----
+def normalize_loadout(loadout, profile=DEFAULT_PROFILE):
+    # Settings that cannot change the breakdown are zeroed, so equivalent
+    # loadouts share one entry (e.g. any level of an inactive stat)
+    rules = RULE_PROFILES[profile]
+    changes = {"extra_costs": float(loadout.extra_costs), "deactivated_regen": False}
+    if loadout.power1_inactive:
+        changes.update(power1=0, upkeep1=False)
+    if loadout.power2_inactive or not rules["upkeep2"]:
+        changes["upkeep2"] = False
+    if loadout.power2_inactive:
+        changes["power2"] = 0
+    if loadout.range_inactive:
+        changes["range_stat"] = 0
+    if loadout.mobility_inactive:
+        changes["mobility_stat"] = 0
+    if loadout.control_inactive:
+        # An inactive Control reduces nothing, whatever the rules give Control 0
+        changes["control"] = 0
+    if not rules["upkeep_buff"] or loadout.buff_debuff == 0:
+        changes["upkeep_buff"] = False
+    return loadout._replace(**changes)
+
+
+def cached_breakdown(loadout, profile=DEFAULT_PROFILE):
+    # Keyed on the rule tables too, so a hot-swapped rules file never serves stale costs
+    rules = current_rules()
+    key = (normalize_loadout(loadout, profile), profile, rules.fingerprint)
+
+    def compute():
+        started = time.perf_counter()
+        breakdown = priced_breakdown(key[0], profile, rules)
+        cost_engine_seconds.observe(time.perf_counter() - started, "breakdown")
+        return breakdown
+
+    return dict(breakdown_cache.get(key, compute))
+
+
+def cache_stats():
+    return breakdown_cache.stats()
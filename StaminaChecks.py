@@ -0,0 +1,267 @@
+import argparse
+import itertools
+import random
+import sys
+from fractions import Fraction
+
+import numpy as np
+
+from StaminaAfford import AFFORDABLE_STATS, COST_KEYS, affordable, max_affordable_level, max_affordable_uses
+from StaminaEffects import WHEEL_SIZE, TimerWheel
+from StaminaEngine import DEFAULT_LOADOUT, compute_breakdown, compute_total_cost, fast_forward, max_ep_for, next_turn, regen_for_turn
+from StaminaFrontier import skyline
+from StaminaRest import rest, turns_to_full
+from StaminaRules import current_rules
+
+# Randomized property checks for the shortcuts that stand in for stepping:
+# fast_forward, rests and affordability against repeated next_turn, the
+# timer wheel against a plain dict of due turns, and the frontier skyline
+# against a pairwise comparison.  Each check draws one random case and
+# returns None, or a description of the case that disagrees.
+#
+#   python StaminaChecks.py [--trials 200] [--seed 1] [--only fast_forward]
+#
+# Stepping is done in exact fractions, the same as fast_forward, so EP has to
+# match exactly.  Exits with status 1 if any check fails.
+
+MAX_SCAN = 5000  # uses the linear affordability scan tries before giving up on a case
+
+
+# ----- Reference stepping -----
+def step_turns(current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen=False):
+    # next_turn `turns` times, noting the turns that could not be paid in full
+    ep = Fraction(current_ep)
+    cost = Fraction(total_cost)
+    turn = turn_count
+    exhausted = []
+    applied = 0
+    for _ in range(turns):
+        available = min(ep + regen_for_turn(max_ep, turn, deactivated_regen), max_ep)
+        if available < cost:
+            exhausted.append(turn)
+        applied += max(0, available - ep)
+        ep, turn = next_turn(ep, turn, max_ep, cost, deactivated_regen)
+    return ep, turn, exhausted, applied
+
+
+def random_turn_state(rng, rules):
+    if rng.random() < 0.2:
+        max_ep = rng.randrange(0, 12)  # regen rounds to 0 below 5
+    else:
+        max_ep = rng.choice(rules.endurance_to_max_ep.table)
+    current_ep = rng.choice([0, max_ep, rng.randrange(max_ep + 1), Fraction(rng.randrange(4 * max_ep + 8), 4)])
+    turn_count = rng.choice([0, 1, 2, rng.randrange(10 ** 6)])
+    return current_ep, turn_count, max_ep, rng.random() < 0.25
+
+
+# ----- Checks -----
+def check_fast_forward(rng, rules):
+    current_ep, turn_count, max_ep, deactivated_regen = random_turn_state(rng, rules)
+    total_cost = rng.choice([
+        0,
+        Fraction(rng.randrange(4 * max_ep + 8), 4),
+        rng.uniform(0, max_ep / 2 + 1),
+        -Fraction(rng.randrange(40), 4),
+    ])
+    turns = rng.choice([0, 1, 2, 3, rng.randrange(400)])
+    ep, turn, exhausted, applied = step_turns(current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen)
+    result = fast_forward(current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen)
+    expected = {
+        "current_ep": float(ep),
+        "turn_count": turn,
+        "exhausted_turn": exhausted[0] if exhausted else None,
+        "exhausted_turns": len(exhausted),
+        "regen_applied": float(applied),
+    }
+    got = {key: result[key] for key in expected}
+    if got != expected:
+        case = (current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen)
+        return f"fast_forward{case} gave {got}, stepping gave {expected}"
+    return None
+
+
+def check_rest(rng, rules):
+    current_ep, turn_count, max_ep, deactivated_regen = random_turn_state(rng, rules)
+    turns = rng.choice([0, 1, 2, rng.randrange(300)])
+    ep, turn, _, _ = step_turns(current_ep, turn_count, max_ep, 0, turns, deactivated_regen)
+    result = rest(current_ep, turn_count, max_ep, turns, deactivated_regen)
+    if (result["current_ep"], result["turn_count"]) != (ep, turn):
+        case = (current_ep, turn_count, max_ep, turns, deactivated_regen)
+        return f"rest{case} gave {result}, stepping gave EP {ep} on turn {turn}"
+
+    needed = turns_to_full(current_ep, turn_count, max_ep, deactivated_regen)
+    ep, turn, steps = Fraction(current_ep), turn_count, 0
+    while ep < max_ep and steps <= 2 * max_ep + 2:
+        ep, turn = next_turn(ep, turn, max_ep, 0, deactivated_regen)
+        steps += 1
+    expected = steps if ep >= max_ep else None
+    if needed != expected:
+        case = (current_ep, turn_count, max_ep, deactivated_regen)
+        return f"turns_to_full{case} gave {needed}, stepping gave {expected}"
+    return None
+
+
+def check_timer_wheel(rng, rules):
+    # A burst of entries due over the next two level-2 slots, then scattered
+    # adds and cancels: entries are placed at levels 0-2 and cascade down on
+    # the way.  (Level 3 and the overflow are 64 ** 3 turns out, too far to step.)
+    span = WHEEL_SIZE ** 2
+    wheel = TimerWheel(rng.randrange(10 ** 6))
+    due = {}  # key -> the tick it must fire on
+    keys = itertools.count()
+
+    def schedule(delay):
+        key = next(keys)
+        wheel.schedule(key, wheel.now + delay, key)
+        due[key] = max(wheel.now + delay, wheel.now + 1)
+
+    for _ in range(200):
+        schedule(rng.randrange(-2, 2 * span))
+    for _ in range(2 * span + WHEEL_SIZE):
+        if rng.random() < 0.02:
+            schedule(rng.choice([-2, 0, 1, 2, rng.randrange(WHEEL_SIZE), rng.randrange(span)]))
+        if due and rng.random() < 0.01:
+            key = rng.choice(list(due))
+            if wheel.cancel(key) != key:
+                return f"cancel({key}) on turn {wheel.now} did not return its item"
+            del due[key]
+        fired = set(wheel.tick())
+        expected = {key for key, turn in due.items() if turn == wheel.now}
+        if fired != expected:
+            return f"turn {wheel.now} fired {sorted(fired)}, expected {sorted(expected)}"
+        for key in expected:
+            del due[key]
+        if len(wheel) != len(due):
+            return f"turn {wheel.now}: wheel holds {len(wheel)} entries, expected {len(due)}"
+    return None
+
+
+def dominated(cost, stat_total, i):
+    # True if another point matches or beats point i on both counts, and beats it on one
+    better = (cost <= cost[i]) & (stat_total >= stat_total[i]) & ((cost < cost[i]) | (stat_total > stat_total[i]))
+    return bool(better.any())
+
+
+def check_skyline(rng, rules):
+    count = rng.randrange(1, 300)
+    cost = np.array([rng.randrange(40) / 4 for _ in range(count)])
+    stat_total = np.array([rng.randrange(30) for _ in range(count)], dtype=np.int32)
+    kept = skyline(cost, stat_total)
+    expected = [i for i in range(count) if not dominated(cost, stat_total, i)]
+    if sorted(kept.tolist()) != expected:
+        return f"skyline of {count} points kept {sorted(kept.tolist())}, expected {expected}"
+    if list(np.lexsort((-stat_total[kept], cost[kept]))) != list(range(len(kept))):
+        return "skyline is not in order of cost"
+    # build_frontier keeps each slice's skyline only; the skyline of those must be the same
+    cut = sorted(rng.sample(range(count + 1), min(3, count + 1)))
+    slices = [np.arange(start, end) for start, end in zip([0, *cut], [*cut, count])]
+    candidates = np.concatenate([part[skyline(cost[part], stat_total[part])] for part in slices if len(part)])
+    merged = candidates[skyline(cost[candidates], stat_total[candidates])]
+    if sorted(merged.tolist()) != expected:
+        return f"skyline over slices kept {sorted(merged.tolist())}, expected {expected}"
+    return None
+
+
+def random_loadout(rng, rules):
+    levels = len(rules.ep_cost.table)
+    return DEFAULT_LOADOUT._replace(
+        endurance=rng.randrange(len(rules.endurance_to_max_ep.table)),
+        power1=rng.randrange(levels),
+        power2=rng.randrange(levels),
+        range_stat=rng.randrange(levels),
+        control=rng.randrange(levels),
+        mobility_stat=rng.randrange(levels),
+        buff_debuff=rng.randrange(len(rules.buff_debuff.table)),
+        power2_inactive=rng.random() < 0.3,
+        range_inactive=rng.random() < 0.3,
+        control_inactive=rng.random() < 0.2,
+        mobility_inactive=rng.random() < 0.3,
+        upkeep1=rng.random() < 0.3,
+        extra_costs=rng.choice([0.0, rng.randrange(-200, 40) / 4]),
+        deactivated_regen=rng.random() < 0.2,
+    )
+
+
+def check_affordability(rng, rules):
+    loadout = random_loadout(rng, rules)
+    max_ep = max_ep_for(loadout.endurance, rules)
+    current_ep = rng.choice([max_ep, rng.randrange(max_ep + 1)])
+    turn_count = rng.randrange(1, 100)
+    turns = rng.choice([1, 2, rng.randrange(1, 30)])
+    case = (loadout, current_ep, turn_count, turns)
+
+    def paid(total_cost):
+        _, _, exhausted, _ = step_turns(current_ep, turn_count, max_ep, total_cost, turns, loadout.deactivated_regen)
+        return not exhausted
+
+    total_cost = compute_breakdown(loadout, rules=rules)["total_cost"]
+    if affordable(total_cost, current_ep, turn_count, max_ep, turns, loadout.deactivated_regen) != paid(total_cost):
+        return f"affordable({total_cost}) disagrees with stepping for {case}"
+
+    label = rng.choice(list(AFFORDABLE_STATS))
+    level_field, inactive_field, cost_key = AFFORDABLE_STATS[label]
+    active = loadout._replace(**{inactive_field: False})
+    expected = None
+    for level in range(rules.max_stat + 1):
+        if not paid(compute_breakdown(active._replace(**{level_field: level}), rules=rules)["total_cost"]):
+            break
+        expected = level
+    got = max_affordable_level(label, loadout, current_ep, turn_count, turns, rules=rules)
+    if got != expected:
+        return f"max_affordable_level({label!r}) gave {got}, a scan gave {expected} for {case}"
+
+    breakdown = compute_breakdown(active, rules=rules)
+    per_use = breakdown[cost_key]
+    if per_use == 0:
+        return None
+    others = sum(breakdown[key] for key in COST_KEYS) - per_use
+    expected = None
+    for uses in range(MAX_SCAN):
+        if not paid(compute_total_cost(others + per_use * uses)):
+            break
+        expected = uses
+    else:
+        return None  # too many uses to scan
+    got = max_affordable_uses(label, loadout, current_ep, turn_count, turns, rules=rules)
+    if got != expected:
+        return f"max_affordable_uses({label!r}) gave {got}, a scan gave {expected} for {case}"
+    return None
+
+
+# check name -> (check, share of --trials it runs; the wheel check steps thousands of turns per trial)
+CHECKS = {
+    "fast_forward": (check_fast_forward, 1),
+    "rest": (check_rest, 1),
+    "timer_wheel": (check_timer_wheel, 0.025),
+    "skyline": (check_skyline, 1),
+    "affordability": (check_affordability, 0.25),
+}
+
+
+def run_checks(trials, seed, names=None, rules=None):
+    # Returns {check name: first failure or None}
+    rules = rules or current_rules()
+    results = {}
+    for name in names or CHECKS:
+        check, share = CHECKS[name]
+        rng = random.Random(f"{seed}-{name}")
+        failure = None
+        for _ in range(max(1, int(trials * share))):
+            failure = check(rng, rules)
+            if failure is not None:
+                break
+        results[name] = failure
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Randomized property checks of the O(1) shortcuts against stepping")
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--seed", default="1")
+    parser.add_argument("--only", action="append", choices=list(CHECKS), help="run just this check (repeatable)")
+    args = parser.parse_args()
+
+    results = run_checks(args.trials, args.seed, args.only)
+    for name, failure in results.items():
+        print(f"{name}: {'ok' if failure is None else 'FAILED: ' + failure}")
+    sys.exit(1 if any(failure is not None for failure in results.values()) else 0)
@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+
+from StaminaCache import LRUCache, normalize_loadout
+from StaminaCostSpace import mapped_cost_space
+from StaminaEngine import DEFAULT_PROFILE, RULE_PROFILES, fast_forward, max_ep_for
+from StaminaMetrics import cost_engine_seconds, watch_cache
+from StaminaRules import current_rules
+
+# Side-by-side pricing of candidate loadouts.  Every candidate that is not
+# cached yet is priced in one numpy pass over all of them; each candidate is
+# then cached on its own, so editing one candidate only prices that one.
+# Per-stat costs are read from the mapped cost space; levels past its tables
+# use the rules in StaminaEngine, applied to arrays.
+
+MAX_CANDIDATES = 12
+PROJECTION_TURNS = 10 ** 6  # beyond this a loadout counts as never running out
+
+comparison_cache = LRUCache()
+watch_cache("comparison", comparison_cache)
+
+
+# ----- Vectorized Rules -----
+def round_quarters_up(cost):
+    # Only round up if .25 or .75; .5 is left alone
+    frac = cost % 1
+    return np.where((frac == 0.25) | (frac == 0.75), np.ceil(cost * 2) / 2, cost)
+
+
+def at_least_one(cost, active_min_one):
+    # Any cost above 0 is at least 1; with active_min_one a zero cost is 1 too
+    return np.maximum(cost, 1) if active_min_one else np.where(cost > 0, np.maximum(cost, 1), 0.0)
+
+
+def stat_costs(table, stats, inactive, control_reduction, upkeep, active_min_one):
+    cost = table.lookup(stats).astype(float)
+    cost = np.where(upkeep, cost / 2, cost)
+    cost = round_quarters_up(np.maximum(cost - control_reduction, 0))
+    return np.where(inactive, 0.0, at_least_one(cost, active_min_one))
+
+
+def mobility_costs(table, stats, inactive, control_reduction, active_min_one):
+    cost = np.round(np.maximum(table.lookup(stats) - control_reduction, 0) / 2)
+    return np.where(inactive, 0.0, at_least_one(cost, active_min_one))
+
+
+def buff_costs(table, buffs, upkeep):
+    cost = table.lookup(buffs).astype(float)
+    return np.ceil(np.where(upkeep, cost / 2, cost))
+
+
+def price_loadouts(loadouts, profile=DEFAULT_PROFILE, rules=None):
+    # One pass over every loadout; returns a list of cost dicts like compute_breakdown's
+    columns = {field: np.array([getattr(loadout, field) for loadout in loadouts]) for field in loadouts[0]._fields}
+    costs = price_columns(columns, profile, rules)
+    return [
+        {name: float(values[i]) for name, values in costs.items()}
+        for i in range(len(loadouts))
+    ]
+
+
+def price_columns(columns, profile=DEFAULT_PROFILE, rules=None):
+    # Same costs for loadouts given column-wise (one array per Loadout field), as arrays
+    rules = rules or current_rules()
+    profile_rules = RULE_PROFILES[profile]
+
+    control_reduction = np.where(
+        columns["control_inactive"], 0.0, rules.control_reduction.lookup(columns["control"]).astype(float)
+    )
+    space = mapped_cost_space(rules)
+    if space is not None and space.covers(columns):
+        costs = space.cost_columns(columns, profile)
+    else:
+        costs = engine_cost_columns(columns, profile_rules, rules, control_reduction)
+    raw_total = sum(costs.values()) + columns["extra_costs"].astype(float)
+    total = round_quarters_up(raw_total)
+    # Final min 1 unless total is exactly 0
+    costs["total_cost"] = np.where(total > 0, np.maximum(total, 1), total)
+    costs["control_reduction"] = control_reduction
+    return costs
+
+
+def engine_cost_columns(columns, profile_rules, rules, control_reduction):
+    min_one = profile_rules["active_min_one"]
+    return {
+        "ep_power1": stat_costs(
+            rules.ep_cost, columns["power1"], columns["power1_inactive"], control_reduction, columns["upkeep1"], min_one
+        ),
+        "ep_power2": stat_costs(
+            rules.ep_cost, columns["power2"], columns["power2_inactive"], control_reduction,
+            columns["upkeep2"] & profile_rules["upkeep2"], min_one,
+        ),
+        "ep_range": stat_costs(
+            rules.ep_cost, columns["range_stat"], columns["range_inactive"], control_reduction, False, min_one
+        ),
+        "ep_mobility": mobility_costs(
+            rules.ep_cost, columns["mobility_stat"], columns["mobility_inactive"], control_reduction, min_one
+        ),
+        "buff_debuff_cost": buff_costs(
+            rules.buff_debuff, columns["buff_debuff"], columns["upkeep_buff"] & profile_rules["upkeep_buff"]
+        ),
+    }
+
+
+# ----- Comparison -----
+def compare_loadouts(loadouts, current_ep, turn_count, profile=DEFAULT_PROFILE):
+    # Costs come from the cache; the turn projection depends on the current EP
+    # and is O(1) per candidate, so it is not cached
+    rules = current_rules()
+    keys = [(normalize_loadout(loadout, profile), profile, rules.fingerprint) for loadout in loadouts]
+
+    def price_missing(missing):
+        started = time.perf_counter()
+        prices = price_loadouts([key[0] for key in missing], profile, rules)
+        cost_engine_seconds.observe(time.perf_counter() - started, "compare")
+        return prices
+
+    costs = comparison_cache.get_many(keys, price_missing)
+
+    rows = []
+    for loadout, cost in zip(loadouts, costs):
+        max_ep = max_ep_for(loadout.endurance, rules)
+        projection = fast_forward(
+            min(current_ep, max_ep), turn_count, max_ep, cost["total_cost"], PROJECTION_TURNS, loadout.deactivated_regen
+        )
+        exhausted_turn = projection["exhausted_turn"]
+        rows.append({
+            **cost,
+            "max_ep": max_ep,
+            "turns_until_out": None if exhausted_turn is None else exhausted_turn - turn_count,
+        })
+    return rows
@@ -0,0 +1,308 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+
+import numpy as np
+
+from StaminaEngine import (
+    DEFAULT_PROFILE,
+    RULE_PROFILES,
+    compute_breakdown,
+    compute_buff_cost,
+    compute_mobility_cost,
+    compute_stat_cost,
+    compute_total,
+    compute_total_cost,
+    max_ep_for,
+)
+from StaminaRules import current_rules
+
+# Precomputed cost space, written once by a build step and shared read-only
+# between processes through mmap.
+#
+# The total cost is a sum of per-stat costs followed by one rounding step, so
+# the file holds the per-stat tables for every control level, upkeep flag and
+# rule profile rather than every full loadout (which would be billions of
+# rows).  A lookup is five table reads, an add and compute_total_cost.
+# Only the listed table levels are stored; loadouts with a stat past them are
+# priced by the engine from the scaling rules.
+#
+# The breakdown cache, Compare Loadouts (and the frontier sweep through it)
+# and the balance report price through priced_breakdown / mapped_cost_space;
+# if the file cannot be built or was built from other rules, they fall back
+# to the engine.
+#
+# Costs are stored as little-endian uint16 in quarter-EP units.
+#
+# Layout:
+#   header     "EPCS", version u16, profile count u16, rules fingerprint (16 bytes),
+#              stat levels u16, buff levels u16, endurance levels u16
+#   directory  per profile: name (16 bytes, NUL padded), flags u16, offset u32
+#   tables     per profile, in this order:
+#              stat     [control][stat][upkeep 2]
+#              mobility [control][stat]
+#              (control runs over the stat levels and then one row for an
+#              inactive Control, which reduces nothing)
+#              buff     [buff][upkeep 2]
+#              max_ep   [endurance]
+
+COST_SPACE_MAGIC = b"EPCS"
+COST_SPACE_VERSION = 3
+COST_SPACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stamina_cost_space.bin")
+
+HEADER = struct.Struct("<4sHH16sHHH")
+DIRECTORY_ENTRY = struct.Struct("<16sHI")
+
+FLAG_ACTIVE_MIN_ONE = 1
+FLAG_UPKEEP2 = 2
+FLAG_UPKEEP_BUFF = 4
+
+
+# ----- Build Step -----
+def quarters(cost):
+    return int(round(cost * 4))
+
+
+def build_profile_tables(profile_rules, rules):
+    min_one = profile_rules["active_min_one"]
+    levels = range(len(rules.ep_cost.table))
+    reductions = [rules.control_reduction[control] for control in levels] + [0]
+    tables = array("H")
+    for reduction in reductions:
+        for stat in levels:
+            for upkeep in (False, True):
+                tables.append(quarters(compute_stat_cost(stat, False, reduction, upkeep, min_one, rules)))
+    for reduction in reductions:
+        for stat in levels:
+            tables.append(quarters(compute_mobility_cost(stat, False, reduction, min_one, rules)))
+    for buff in range(len(rules.buff_debuff.table)):
+        for upkeep in (False, True):
+            tables.append(quarters(compute_buff_cost(buff, upkeep, rules)))
+    for max_ep in rules.endurance_to_max_ep.table:
+        tables.append(quarters(max_ep))
+    return tables
+
+
+def profile_flags(profile_rules):
+    flags = 0
+    if profile_rules["active_min_one"]:
+        flags |= FLAG_ACTIVE_MIN_ONE
+    if profile_rules["upkeep2"]:
+        flags |= FLAG_UPKEEP2
+    if profile_rules["upkeep_buff"]:
+        flags |= FLAG_UPKEEP_BUFF
+    return flags
+
+
+def build_cost_space(path=COST_SPACE_PATH, rules=None):
+    rules = rules or current_rules()
+    names = list(RULE_PROFILES)
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(names)
+
+    blob = bytearray(HEADER.pack(
+        COST_SPACE_MAGIC, COST_SPACE_VERSION, len(names), rules.fingerprint.encode("ascii"),
+        len(rules.ep_cost.table), len(rules.buff_debuff.table), len(rules.endurance_to_max_ep.table),
+    ))
+    payload = bytearray()
+    for name in names:
+        profile_rules = RULE_PROFILES[name]
+        tables = build_profile_tables(profile_rules, rules)
+        if sys.byteorder != "little":
+            tables.byteswap()
+        blob += DIRECTORY_ENTRY.pack(name.encode("ascii"), profile_flags(profile_rules), offset + len(payload))
+        payload += tables.tobytes()
+    blob += payload
+
+    # Write next to the target under a name no other writer uses, then swap
+    # in, so readers never see half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+# ----- Loading -----
+class CostSpace:
+    def __init__(self, path=COST_SPACE_PATH):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, fingerprint, n_stat, n_buff, n_endurance = HEADER.unpack_from(self.mm, 0)
+        if magic != COST_SPACE_MAGIC or version != COST_SPACE_VERSION:
+            raise ValueError(f"{path} is not a version {COST_SPACE_VERSION} cost space file")
+
+        self.fingerprint = fingerprint.decode("ascii")
+        self.n_stat = n_stat
+        self.n_buff = n_buff
+        self.n_endurance = n_endurance
+        self.stat_size = (n_stat + 1) * n_stat * 2
+        self.mobility_size = (n_stat + 1) * n_stat
+        self.buff_size = n_buff * 2
+        profile_size = self.stat_size + self.mobility_size + self.buff_size + n_endurance
+
+        view = memoryview(self.mm)
+        self.profiles = {}
+        for i in range(count):
+            raw_name, flags, offset = DIRECTORY_ENTRY.unpack_from(self.mm, HEADER.size + i * DIRECTORY_ENTRY.size)
+            section = view[offset:offset + profile_size * 2]
+            if sys.byteorder == "little":
+                # Zero-copy: the tables are the mapped pages themselves
+                tables = section.cast("H")
+            else:
+                tables = array("H", section)
+                tables.byteswap()
+            self.profiles[raw_name.rstrip(b"\0").decode("ascii")] = (flags, tables)
+
+    def stat_quarters(self, loadout, profile=DEFAULT_PROFILE):
+        # (power1, power2, range, mobility, buff) costs in quarter EP, or None
+        # if a level is past the stored tables
+        flags, tables = self.profiles[profile]
+        n_stat = self.n_stat
+        if max(loadout.power1, loadout.power2, loadout.range_stat, loadout.mobility_stat) >= n_stat or loadout.buff_debuff >= self.n_buff:
+            return None
+        if loadout.control_inactive:
+            control = n_stat
+        elif loadout.control < n_stat:
+            control = loadout.control
+        else:
+            return None
+        stat_row = control * n_stat * 2
+        mobility_row = self.stat_size + control * n_stat
+
+        return (
+            0 if loadout.power1_inactive else tables[stat_row + loadout.power1 * 2 + loadout.upkeep1],
+            0 if loadout.power2_inactive else tables[stat_row + loadout.power2 * 2 + (loadout.upkeep2 and flags & FLAG_UPKEEP2 > 0)],
+            0 if loadout.range_inactive else tables[stat_row + loadout.range_stat * 2],
+            0 if loadout.mobility_inactive else tables[mobility_row + loadout.mobility_stat],
+            tables[self.stat_size + self.mobility_size + loadout.buff_debuff * 2 + (loadout.upkeep_buff and flags & FLAG_UPKEEP_BUFF > 0)],
+        )
+
+    def total_cost(self, loadout, profile=DEFAULT_PROFILE):
+        quarters = self.stat_quarters(loadout, profile)
+        if quarters is None:
+            return compute_total(loadout, profile)
+        return compute_total_cost(sum(quarters) / 4 + loadout.extra_costs)
+
+    def breakdown(self, loadout, profile=DEFAULT_PROFILE, rules=None):
+        # Same dict as compute_breakdown; `rules` must be the rules the file was built from
+        rules = rules or current_rules()
+        quarters = self.stat_quarters(loadout, profile)
+        if quarters is None:
+            return compute_breakdown(loadout, profile, rules)
+        ep_power1, ep_power2, ep_range, ep_mobility, buff_debuff_cost = (q / 4 for q in quarters)
+        return {
+            "max_ep": rules.endurance_to_max_ep[loadout.endurance],
+            "control_reduction": 0 if loadout.control_inactive else rules.control_reduction[loadout.control],
+            "ep_power1": ep_power1,
+            "ep_power2": ep_power2,
+            "ep_range": ep_range,
+            "ep_mobility": ep_mobility,
+            "buff_debuff_cost": buff_debuff_cost,
+            "extra_costs": loadout.extra_costs,
+            "total_cost": compute_total_cost(sum(quarters) / 4 + loadout.extra_costs),
+        }
+
+    def covers(self, columns):
+        # True if every loadout in the columns (one array per Loadout field) is in the stored tables
+        stats = [columns[field] for field in ("power1", "power2", "range_stat", "mobility_stat")]
+        control = np.where(columns["control_inactive"], 0, columns["control"])
+        return (
+            all(int(values.max(initial=0)) < self.n_stat for values in (*stats, control))
+            and int(columns["buff_debuff"].max(initial=0)) < self.n_buff
+        )
+
+    def cost_columns(self, columns, profile=DEFAULT_PROFILE):
+        # Per-stat costs of column-wise loadouts as float arrays, read straight
+        # from the mapped tables; only for columns the tables cover
+        flags, tables = self.profiles[profile]
+        tables = np.frombuffer(tables, dtype=np.uint16)
+        n_stat = self.n_stat
+        control = np.where(columns["control_inactive"], n_stat, columns["control"]).astype(np.intp)
+        stat_row = control * n_stat * 2
+        mobility_row = self.stat_size + control * n_stat
+        upkeep2 = columns["upkeep2"] & bool(flags & FLAG_UPKEEP2)
+        upkeep_buff = columns["upkeep_buff"] & bool(flags & FLAG_UPKEEP_BUFF)
+
+        def read(inactive, index):
+            return np.where(inactive, 0.0, tables[index] / 4)
+
+        return {
+            "ep_power1": read(columns["power1_inactive"], stat_row + columns["power1"] * 2 + columns["upkeep1"]),
+            "ep_power2": read(columns["power2_inactive"], stat_row + columns["power2"] * 2 + upkeep2),
+            "ep_range": read(columns["range_inactive"], stat_row + columns["range_stat"] * 2),
+            "ep_mobility": read(columns["mobility_inactive"], mobility_row + columns["mobility_stat"]),
+            "buff_debuff_cost": read(False, self.stat_size + self.mobility_size + columns["buff_debuff"] * 2 + upkeep_buff),
+        }
+
+    def max_ep(self, endurance, profile=DEFAULT_PROFILE):
+        if endurance >= self.n_endurance:
+            return max_ep_for(endurance)
+        return self.profiles[profile][1][self.stat_size + self.mobility_size + self.buff_size + endurance] // 4
+
+
+_cost_space = None
+_cost_space_lock = threading.Lock()
+
+
+def load_cost_space(path=COST_SPACE_PATH):
+    # One mapping per process; the pages behind it are shared by every process.
+    # A file built from other rule tables (or a hot-swapped rules file) is rebuilt.
+    # Sessions share the process, so only one of them checks and rebuilds at a time.
+    global _cost_space
+    fingerprint = current_rules().fingerprint
+    space = _cost_space
+    if space is not None and space.fingerprint == fingerprint:
+        return space
+    with _cost_space_lock:
+        if _cost_space is None or _cost_space.fingerprint != fingerprint:
+            try:
+                space = CostSpace(path)
+            except (OSError, ValueError, struct.error):
+                space = None
+            if space is None or space.fingerprint != fingerprint:
+                build_cost_space(path)
+                space = CostSpace(path)
+            _cost_space = space
+        return _cost_space
+
+
+_unbuildable = None  # fingerprint of rules whose file could not be built here
+
+
+def mapped_cost_space(rules=None):
+    # The mapped cost space for these rules, or None if there is none (the
+    # file cannot be written here, or the rules were swapped mid-call)
+    global _unbuildable
+    rules = rules or current_rules()
+    if _unbuildable == rules.fingerprint:
+        return None
+    try:
+        space = load_cost_space()
+    except (OSError, ValueError, struct.error) as err:
+        print(f"Cost space not mapped, pricing with the engine: {err}", file=sys.stderr)
+        _unbuildable = rules.fingerprint
+        return None
+    return space if space.fingerprint == rules.fingerprint else None
+
+
+def priced_breakdown(loadout, profile=DEFAULT_PROFILE, rules=None):
+    rules = rules or current_rules()
+    space = mapped_cost_space(rules)
+    if space is None:
+        return compute_breakdown(loadout, profile, rules)
+    return space.breakdown(loadout, profile, rules)
+
+
+if __name__ == "__main__":
+    written = build_cost_space(sys.argv[1] if len(sys.argv) > 1 else COST_SPACE_PATH)
+    print(f"Wrote {written} ({os.path.getsize(written)} bytes, {len(RULE_PROFILES)} profiles)")
@@ -0,0 +1,139 @@
+import re
+
+import numpy as np
+
+from StaminaEngine import (
+    DEFAULT_PROFILE,
+    compute_breakdown,
+    compute_total_cost,
+    max_ep_for,
+    regen_for_turn,
+)
+
+# Exact distribution of current EP turn by turn when Extra Costs are random
+# (dice-driven surcharges).  EP is tracked in quarter-point units.  Each turn
+# applies regen, the clamp to max EP, a convolution with that turn's cost
+# distribution and the clamp to 0, in the same order as the Next Turn button.
+# The clamps make the chain non-linear, so turns are stepped one at a time;
+# wide cost distributions are convolved with an FFT.
+
+FFT_THRESHOLD = 64  # cost support width above which the FFT beats direct convolution
+
+DICE_RE = re.compile(r"^(\d*)d(\d+)\s*(?:([+-])\s*(\d+(?:\.\d+)?))?$")
+
+
+# ----- Extra Cost Distributions -----
+def dice_distribution(spec):
+    # "2d6+1" -> {total: probability}
+    match = DICE_RE.match(spec.strip().lower())
+    if not match:
+        raise ValueError(f"Expected dice like '1d6' or '2d4+1', got '{spec}'")
+    count = int(match.group(1) or 1)
+    sides = int(match.group(2))
+    if count < 1 or sides < 1:
+        raise ValueError(f"Dice need at least one die with at least one side, got '{spec}'")
+    bonus = float(match.group(4) or 0)
+    if match.group(3) == "-":
+        bonus = -bonus
+
+    pmf = np.array([1.0])
+    die = np.full(sides, 1.0 / sides)
+    for _ in range(count):
+        pmf = np.convolve(pmf, die)
+    # pmf[i] is the chance of rolling count + i
+    return {count + i + bonus: p for i, p in enumerate(pmf)}
+
+
+def to_quarters(value):
+    q = value * 4
+    if q != int(q):
+        raise ValueError(f"{value} is not a multiple of 0.25 EP")
+    return int(q)
+
+
+def cost_distribution(loadout, extra_distribution, profile=DEFAULT_PROFILE):
+    # Pushes each extra cost through the total-cost rounding rules.
+    # Returns (offset, pmf) with pmf[i] the chance of paying offset + i quarters.
+    breakdown = compute_breakdown(loadout._replace(extra_costs=0.0), profile)
+    base = (
+        breakdown["ep_power1"] + breakdown["ep_power2"] + breakdown["ep_range"]
+        + breakdown["ep_mobility"] + breakdown["buff_debuff_cost"]
+    )
+    costs = {}
+    for extra, p in extra_distribution.items():
+        q = to_quarters(compute_total_cost(base + extra))
+        if q < 0:
+            raise ValueError("Extra costs that make the total negative are not supported")
+        costs[q] = costs.get(q, 0.0) + p
+
+    offset = min(costs)
+    pmf = np.zeros(max(costs) - offset + 1)
+    for q, p in costs.items():
+        pmf[q - offset] += p
+    return offset, pmf / pmf.sum()
+
+
+# ----- Stepping -----
+def convolve(a, b):
+    if min(len(a), len(b)) <= FFT_THRESHOLD:
+        return np.convolve(a, b)
+    n = len(a) + len(b) - 1
+    size = 1 << (n - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:n]
+    return np.clip(result, 0.0, None)
+
+
+def pay(pmf, offset, cost_pmf):
+    # Distribution of EP - cost, as an array indexed from -(offset + len(cost_pmf) - 1)
+    spread = convolve(pmf, cost_pmf[::-1])
+    lowest = -(offset + len(cost_pmf) - 1)
+    return spread, lowest
+
+
+def ep_distributions(loadout, extra_distribution, turns, current_ep=None, turn_count=1, profile=DEFAULT_PROFILE):
+    max_ep = max_ep_for(loadout.endurance)
+    max_q = max_ep * 4
+    start_q = max_q if current_ep is None else to_quarters(current_ep)
+    offset, cost_pmf = cost_distribution(loadout, extra_distribution, profile)
+
+    ep = np.zeros(max_q + 1)
+    ep[min(start_q, max_q)] = 1.0
+    # Same chain with running out made permanent, for "out of EP by turn k"
+    still_going = ep.copy()
+
+    distributions = []
+    out_by_turn = []
+    for index in range(turns):
+        regen_q = regen_for_turn(max_ep, turn_count + index, loadout.deactivated_regen) * 4
+
+        results = []
+        for pmf in (ep, still_going):
+            # Regen, then clamp to max EP
+            shifted = np.zeros(max_q + 1)
+            shifted[regen_q:] = pmf[:max_q + 1 - regen_q]
+            shifted[max_q] += pmf[max_q + 1 - regen_q:].sum()
+
+            spread, lowest = pay(shifted, offset, cost_pmf)
+            zero = -lowest
+            results.append((spread, zero))
+
+        spread, zero = results[0]
+        ep = np.zeros(max_q + 1)
+        above = spread[zero + 1:]
+        ep[1:len(above) + 1] = above
+        ep[0] = spread[:zero + 1].sum()  # clamp to 0
+        distributions.append(ep)
+
+        spread, zero = results[1]
+        # Mass that could not pay in full this turn is out of EP
+        still_going = np.zeros(max_q + 1)
+        paid = spread[zero:]
+        still_going[:len(paid)] = paid
+        out_by_turn.append(max(0.0, 1.0 - float(still_going.sum())))
+
+    return {
+        "max_ep": max_ep,
+        "ep_values": np.arange(max_q + 1) / 4,
+        "distributions": distributions,
+        "out_of_ep_by_turn": out_by_turn,
+    }
@@ -0,0 +1,134 @@
+import itertools
+from collections import namedtuple
+
+from StaminaEngine import DEFAULT_PROFILE, RULE_PROFILES, compute_buff_cost
+
+# Timed buffs/debuffs.  Each effect adds its Stat Buff/Debuff cost (halved
+# under upkeep, as on the sidebar) to its target until it expires.  Running
+# totals are kept per target and adjusted as effects come and go, so reading
+# the buff cost is O(1) however many effects are active.
+#
+# Expiry is scheduled on a hierarchical timer wheel: 64 slots per level, the
+# level picked by how far away the expiry is.  A tick empties one level-0
+# slot; every 64 ticks the next level's slot is redistributed into the level
+# below.  Ticks are O(1) amortized plus the effects that actually expire.
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4  # 64 ** 4 turns ahead; anything later waits in the overflow
+
+Effect = namedtuple("Effect", ["effect_id", "name", "target", "level", "upkeep", "cost", "expires_turn"])
+
+
+class TimerWheel:
+    def __init__(self, now=0):
+        self.now = now
+        self.levels = [[{} for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)]
+        self.overflow = {}
+        self.slots = {}  # key -> the slot dict holding it, for O(1) cancel
+
+    def __len__(self):
+        return len(self.slots)
+
+    def schedule(self, key, expires, item):
+        # Fires on the tick that reaches `expires`; a time already reached fires on the next tick
+        self.place(key, max(expires, self.now + 1), item)
+
+    def place(self, key, expires, item):
+        # During a tick, an entry due on that very tick goes to the level-0 slot about to be emptied
+        delay = expires - self.now
+        slot = self.overflow
+        for level in range(WHEEL_LEVELS):
+            if delay < 1 << (WHEEL_BITS * (level + 1)):
+                slot = self.levels[level][(expires >> (WHEEL_BITS * level)) & WHEEL_MASK]
+                break
+        slot[key] = (expires, item)
+        self.slots[key] = slot
+
+    def cancel(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return None
+        return slot.pop(key)[1]
+
+    def cascade(self, level):
+        # Move one slot of `level` down now that the levels below have wrapped
+        slot = self.levels[level][(self.now >> (WHEEL_BITS * level)) & WHEEL_MASK]
+        entries = list(slot.items())
+        slot.clear()
+        for key, (expires, item) in entries:
+            self.place(key, expires, item)
+
+    def tick(self):
+        # Advance one turn and return the items that expire on it
+        self.now += 1
+        level = 1
+        while level < WHEEL_LEVELS and (self.now >> (WHEEL_BITS * (level - 1))) & WHEEL_MASK == 0:
+            self.cascade(level)
+            level += 1
+        if level == WHEEL_LEVELS and self.now & ((1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1) == 0:
+            entries = list(self.overflow.items())
+            self.overflow.clear()
+            for key, (expires, item) in entries:
+                self.place(key, expires, item)
+
+        slot = self.levels[0][self.now & WHEEL_MASK]
+        expired = [item for key, (expires, item) in slot.items()]
+        for key in slot:
+            del self.slots[key]
+        slot.clear()
+        return expired
+
+
+class EffectTracker:
+    def __init__(self, turn=1, profile=DEFAULT_PROFILE):
+        self.wheel = TimerWheel(turn)
+        self.upkeep_halves = RULE_PROFILES[profile]["upkeep_buff"]
+        self.effects = {}
+        self.totals = {}  # target -> summed buff/debuff cost of its active effects
+        self.ids = itertools.count(1)
+
+    @property
+    def turn(self):
+        return self.wheel.now
+
+    def add(self, name, target, level, duration, upkeep=False):
+        # Active for `duration` turns from now, expiring as turn `turn + duration` starts
+        if duration < 1:
+            raise ValueError(f"Effects last at least 1 turn, got {duration}")
+        cost = compute_buff_cost(level, upkeep and self.upkeep_halves)
+        effect = Effect(next(self.ids), name, target, level, upkeep, cost, self.turn + duration)
+        self.effects[effect.effect_id] = effect
+        self.totals[target] = self.totals.get(target, 0) + cost
+        self.wheel.schedule(effect.effect_id, effect.expires_turn, effect)
+        return effect
+
+    def cancel(self, effect_id):
+        effect = self.wheel.cancel(effect_id)
+        if effect is None:
+            raise ValueError(f"No active effect {effect_id}")
+        self.forget(effect)
+        return effect
+
+    def forget(self, effect):
+        del self.effects[effect.effect_id]
+        self.totals[effect.target] -= effect.cost
+
+    def advance_to(self, turn):
+        # Returns the effects that expired on the way, oldest first
+        expired = []
+        while self.turn < turn:
+            for effect in self.wheel.tick():
+                self.forget(effect)
+                expired.append(effect)
+        return expired
+
+    def total_for(self, target):
+        return self.totals.get(target, 0)
+
+    def active(self, target=None):
+        return [
+            effect for effect in self.effects.values()
+            if target is None or effect.target == target
+        ]
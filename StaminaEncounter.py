@@ -0,0 +1,193 @@
+import heapq
+import itertools
+
+from StaminaEffects import EffectTracker
+from StaminaEngine import next_turn, regen_for_turn
+from StaminaRest import rest_party
+
+# Initiative order for a whole battle.  Every combatant has one entry in a
+# heap keyed on (round, -initiative, arrival order), so the next actor is a
+# pop and re-queuing for the next round is a push, O(log n) each.
+#
+# Each combatant keeps its own EP, total cost and turn count, so regen parity
+# is per combatant, not per round.  Every push gets a fresh token; an entry
+# whose token no longer matches (the combatant was removed) is skipped when
+# it comes up, so nothing is ever re-heaped.
+#
+# Turn flow: next_actor() picks who is up, then the actor either act()s,
+# delay()s to a lower initiative this round, or ready()s.  A readied
+# combatant acts when trigger() is called; if their next turn comes first,
+# the readied action lapses and that turn passes without spending EP.
+#
+# Timed buffs/debuffs are tracked per round on an EffectTracker; their cost
+# is added to the combatant's own cost whenever they spend EP.
+
+
+class Combatant:
+    __slots__ = (
+        "name", "initiative", "max_ep", "current_ep", "total_cost", "turn_count",
+        "deactivated_regen", "token", "readied", "exhausted_turns",
+    )
+
+    def __init__(self, name, initiative, max_ep, total_cost, current_ep=None, turn_count=1, deactivated_regen=False):
+        self.name = name
+        self.initiative = initiative
+        self.max_ep = max_ep
+        self.current_ep = max_ep if current_ep is None else current_ep
+        self.total_cost = total_cost
+        self.turn_count = turn_count
+        self.deactivated_regen = deactivated_regen
+        self.token = 0
+        self.readied = False
+        self.exhausted_turns = 0
+
+    def take_turn(self, cost):
+        # One Next Turn for this combatant; returns the result row
+        regen = regen_for_turn(self.max_ep, self.turn_count, self.deactivated_regen)
+        exhausted = min(self.current_ep + regen, self.max_ep) < cost
+        self.current_ep, self.turn_count = next_turn(
+            self.current_ep, self.turn_count, self.max_ep, cost, self.deactivated_regen
+        )
+        if exhausted:
+            self.exhausted_turns += 1
+        return {
+            "name": self.name,
+            "regen": regen,
+            "cost": cost,
+            "current_ep": self.current_ep,
+            "exhausted": exhausted,
+        }
+
+
+class Encounter:
+    def __init__(self):
+        self.heap = []
+        self.combatants = {}
+        self.arrivals = itertools.count()
+        self.tokens = itertools.count(1)
+        self.round = 1
+        self.position = None  # heap key of the last actor taken off the queue
+        self.current = None  # combatant whose turn it is, until they act, delay or ready
+        self.effects = EffectTracker(turn=self.round)
+
+    def __len__(self):
+        return len(self.combatants)
+
+    def push(self, combatant, round_number):
+        combatant.token = next(self.tokens)
+        heapq.heappush(
+            self.heap,
+            (round_number, -combatant.initiative, next(self.arrivals), combatant.token, combatant.name),
+        )
+
+    # ----- Roster -----
+    def add(self, name, initiative, max_ep, total_cost, current_ep=None, turn_count=1, deactivated_regen=False):
+        if name in self.combatants:
+            raise ValueError(f"'{name}' is already in the encounter")
+        combatant = Combatant(name, initiative, max_ep, total_cost, current_ep, turn_count, deactivated_regen)
+        self.combatants[name] = combatant
+        # Joining mid-round: act this round if their initiative has not come up yet
+        round_number = self.round
+        if self.position is not None and (round_number, -initiative) < self.position[:2]:
+            round_number += 1
+        self.push(combatant, round_number)
+        return combatant
+
+    def remove(self, name):
+        combatant = self.combatants.pop(name, None)
+        if combatant is None:
+            raise ValueError(f"'{name}' is not in the encounter")
+        combatant.token = None  # its heap entry is now stale
+        if self.current is combatant:
+            self.current = None
+        for effect in self.effects.active(name):
+            self.effects.cancel(effect.effect_id)
+
+    def add_effect(self, target, name, level, duration, upkeep=False):
+        # Lasts `duration` rounds, counting the current one
+        if target not in self.combatants:
+            raise ValueError(f"'{target}' is not in the encounter")
+        return self.effects.add(name, target, level, duration, upkeep)
+
+    def cost_for(self, combatant):
+        return combatant.total_cost + self.effects.total_for(combatant.name)
+
+    def rest(self, turns):
+        # Between fights: everyone regains EP over `turns` turns at once; returns {name: EP recovered}
+        return rest_party(self.combatants.values(), turns)
+
+    # ----- Turn Order -----
+    def next_actor(self):
+        if self.current is not None:
+            raise ValueError(f"'{self.current.name}' has not acted, delayed or readied yet")
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            round_number, _, _, token, name = entry
+            combatant = self.combatants.get(name)
+            if combatant is None or combatant.token != token:
+                continue  # removed since it was queued
+            self.round = round_number
+            self.position = entry
+            self.effects.advance_to(round_number)
+            if combatant.readied:
+                # The readied action was never triggered; this turn passes without spending
+                combatant.readied = False
+                combatant.take_turn(0)
+                self.push(combatant, round_number + 1)
+                continue
+            self.current = combatant
+            return combatant
+        return None
+
+    def act(self, cost=None):
+        combatant = self.require_current()
+        result = combatant.take_turn(self.cost_for(combatant) if cost is None else cost)
+        result["round"] = self.round
+        self.push(combatant, self.round + 1)
+        self.current = None
+        return result
+
+    def delay(self, initiative):
+        # Act later this round; the new initiative sticks for later rounds
+        combatant = self.require_current()
+        if initiative >= combatant.initiative:
+            raise ValueError(f"Delaying needs an initiative below {combatant.initiative}, got {initiative}")
+        combatant.initiative = initiative
+        self.push(combatant, self.round)
+        self.current = None
+
+    def ready(self):
+        combatant = self.require_current()
+        combatant.readied = True
+        self.push(combatant, self.round + 1)
+        self.current = None
+
+    def trigger(self, name, cost=None):
+        combatant = self.combatants.get(name)
+        if combatant is None or not combatant.readied:
+            raise ValueError(f"'{name}' has no readied action")
+        combatant.readied = False
+        result = combatant.take_turn(self.cost_for(combatant) if cost is None else cost)
+        result["round"] = self.round
+        return result
+
+    def require_current(self):
+        if self.current is None:
+            raise ValueError("Nobody is acting; call next_actor() first")
+        return self.current
+
+    # ----- Display -----
+    def upcoming(self, count=10):
+        # The next `count` live entries in order, without disturbing the heap
+        stale = len(self.heap) - len(self.combatants) + (self.current is not None)
+        live = []
+        for round_number, _, _, token, name in heapq.nsmallest(count + stale, self.heap):
+            combatant = self.combatants.get(name)
+            if combatant is not None and combatant.token == token:
+                live.append((round_number, combatant))
+                if len(live) == count:
+                    break
+        return live
+
+    def readied_combatants(self):
+        return [combatant for combatant in self.combatants.values() if combatant.readied]
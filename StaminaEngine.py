@@ -0,0 +1,249 @@
+import math
+from collections import namedtuple
+from fractions import Fraction
+
+from StaminaRules import current_rules
+
+# Streamlit-free copy of the Anthesis EP rules, so plans, reports and tools
+# can price loadouts without going through the sliders.  Tables come from the
+# rules file; functions that take `rules` use the current RuleSet when it is
+# None.
+
+# ----- Loadout -----
+# Field names match the sidebar variables; defaults match the sidebar defaults.
+LOADOUT_FIELDS = (
+    "endurance",
+    "power1", "power1_inactive",
+    "power2", "power2_inactive",
+    "range_stat", "range_inactive",
+    "control", "control_inactive",
+    "mobility_stat", "mobility_inactive",
+    "buff_debuff",
+    "extra_costs",
+    "upkeep1", "upkeep2", "upkeep_buff",
+    "deactivated_regen",
+)
+LOADOUT_DEFAULTS = (
+    5,
+    4, False,
+    2, False,
+    3, False,
+    4, False,
+    3, False,
+    0,
+    0.0,
+    False, False, False,
+    False,
+)
+Loadout = namedtuple("Loadout", LOADOUT_FIELDS, defaults=LOADOUT_DEFAULTS)
+
+DEFAULT_LOADOUT = Loadout()
+
+# ----- Rule Profiles -----
+# "anthesis" follows the Anthesis calculator; "stamina" follows
+# StaminaSystemFinale5 (a fully reduced stat costs 0, and only Power Use 1
+# can be put on upkeep).
+RULE_PROFILES = {
+    "anthesis": {"active_min_one": True, "upkeep2": True, "upkeep_buff": True},
+    "stamina": {"active_min_one": False, "upkeep2": False, "upkeep_buff": False},
+}
+DEFAULT_PROFILE = "anthesis"
+
+
+# ----- Rounding -----
+def round_quarters_up(cost):
+    # Only round up if .25 or .75; .5 is left alone
+    frac = cost % 1
+    if frac in [0.25, 0.75]:
+        cost = math.ceil(cost * 2) / 2
+    return cost
+
+
+# ----- EP Cost Function (non-mobility) -----
+def compute_stat_cost(stat_val, inactive, control_reduction, apply_upkeep=False, active_min_one=True, rules=None):
+    if inactive:
+        return 0
+    cost = (rules or current_rules()).ep_cost[stat_val]
+    if apply_upkeep:
+        cost /= 2
+    cost -= control_reduction
+    cost = max(cost, 0)
+    cost = round_quarters_up(cost)
+    return max(cost, 1) if active_min_one or cost > 0 else 0
+
+
+# ----- EP Cost Function for Mobility -----
+def compute_mobility_cost(stat_val, inactive, control_reduction, active_min_one=True, rules=None):
+    if inactive:
+        return 0
+    cost = (rules or current_rules()).ep_cost[stat_val]
+    cost -= control_reduction
+    cost = max(cost, 0)
+    cost /= 2
+    cost = round(cost)
+    return max(cost, 1) if active_min_one or cost > 0 else 0
+
+
+# ----- Buff/Debuff Cost -----
+def compute_buff_cost(buff_val, upkeep=False, rules=None):
+    cost = (rules or current_rules()).buff_debuff[buff_val]
+    if cost == 0:
+        return 0
+    if upkeep:
+        cost /= 2
+    return math.ceil(cost)
+
+
+# ----- Total Cost -----
+def compute_total_cost(raw_total):
+    total_cost = round_quarters_up(raw_total)
+    # Final min 1 unless total is exactly 0
+    if total_cost > 0:
+        total_cost = max(total_cost, 1)
+    return total_cost
+
+
+def compute_breakdown(loadout, profile=DEFAULT_PROFILE, rules=None):
+    # One RuleSet for the whole breakdown, even if the rules are swapped meanwhile
+    rules = rules or current_rules()
+    profile_rules = RULE_PROFILES[profile]
+    min_one = profile_rules["active_min_one"]
+    control_reduction = 0 if loadout.control_inactive else rules.control_reduction[loadout.control]
+
+    ep_power1 = compute_stat_cost(loadout.power1, loadout.power1_inactive, control_reduction, loadout.upkeep1, min_one, rules)
+    ep_power2 = compute_stat_cost(loadout.power2, loadout.power2_inactive, control_reduction, loadout.upkeep2 and profile_rules["upkeep2"], min_one, rules)
+    ep_range = compute_stat_cost(loadout.range_stat, loadout.range_inactive, control_reduction, False, min_one, rules)
+    ep_mobility = compute_mobility_cost(loadout.mobility_stat, loadout.mobility_inactive, control_reduction, min_one, rules)
+    buff_debuff_cost = compute_buff_cost(loadout.buff_debuff, loadout.upkeep_buff and profile_rules["upkeep_buff"], rules)
+
+    raw_total = ep_power1 + ep_power2 + ep_range + ep_mobility + buff_debuff_cost + loadout.extra_costs
+
+    return {
+        "max_ep": rules.endurance_to_max_ep[loadout.endurance],
+        "control_reduction": control_reduction,
+        "ep_power1": ep_power1,
+        "ep_power2": ep_power2,
+        "ep_range": ep_range,
+        "ep_mobility": ep_mobility,
+        "buff_debuff_cost": buff_debuff_cost,
+        "extra_costs": loadout.extra_costs,
+        "total_cost": compute_total_cost(raw_total),
+    }
+
+
+def compute_total(loadout, profile=DEFAULT_PROFILE, rules=None):
+    return compute_breakdown(loadout, profile, rules)["total_cost"]
+
+
+def max_ep_for(endurance, rules=None):
+    return (rules or current_rules()).endurance_to_max_ep[endurance]
+
+
+# ----- Turn Management -----
+def regen_for_turn(max_ep, turn_count, deactivated_regen=False):
+    regen_turn = deactivated_regen or (turn_count % 2 == 0)
+    return int(round(max_ep * 0.10)) if regen_turn else 0
+
+
+def next_turn(current_ep, turn_count, max_ep, total_cost, deactivated_regen=False):
+    # Same order as the Next Turn button: regen, clamp to max, pay, clamp to 0
+    new_ep = current_ep + regen_for_turn(max_ep, turn_count, deactivated_regen)
+    new_ep = min(new_ep, max_ep)
+    new_ep -= total_cost
+    new_ep = max(0, new_ep)
+    return new_ep, turn_count + 1
+
+
+def regen_turns_between(turn_count, turns, deactivated_regen=False):
+    # How many of the turns turn_count .. turn_count + turns - 1 regenerate
+    if deactivated_regen:
+        return turns
+    return (turn_count + turns - 1) // 2 - (turn_count - 1) // 2
+
+
+def fast_forward(current_ep, turn_count, max_ep, total_cost, turns, deactivated_regen=False):
+    # Same result as calling next_turn `turns` times, in a bounded number of steps.
+    # Turns are taken in regen cycles of two.  Between clamps EP moves by the
+    # same amount every cycle, so a run of clean cycles is one multiplication;
+    # once a cycle clamps (to max EP or to 0), the next cycle starting from the
+    # same EP repeats it exactly, so the rest is a repeat count.
+    # Works in exact fractions, so any cost (not just quarter EP) matches stepping.
+    # regen_gained counts every regen; regen_applied is what EP took after the max clamp.
+    ep = Fraction(current_ep)
+    top = Fraction(max_ep)
+    cost = Fraction(total_cost)
+    regen = Fraction(regen_for_turn(max_ep, 0))
+    turn = turn_count
+    left = turns
+    exhausted_turn = None
+    exhausted_turns = 0
+    applied = 0
+
+    def step(ep, turn):
+        available = min(ep + (regen if deactivated_regen or turn % 2 == 0 else 0), top)
+        return max(0, available - cost), available < cost, max(0, available - ep)
+
+    while left > 0:
+        if left == 1:
+            ep, exhausted, step_applied = step(ep, turn)
+            applied += step_applied
+            if exhausted:
+                if exhausted_turn is None:
+                    exhausted_turn = turn
+                exhausted_turns += 1
+            turn += 1
+            left -= 1
+            break
+
+        r0 = regen if deactivated_regen or turn % 2 == 0 else 0
+        r1 = regen if deactivated_regen or (turn + 1) % 2 == 0 else 0
+        drain = 2 * cost - r0 - r1  # EP lost per clean cycle
+        # A cycle is clean (no clamp, nothing unaffordable) while lowest <= EP <= highest
+        lowest = max(cost - r0, 2 * cost - r0 - r1)
+        highest = min(top - r0, top - r0 - r1 + cost)
+
+        if lowest <= ep <= highest:
+            if drain > 0:
+                cycles = (ep - lowest) // drain + 1
+            elif drain < 0:
+                cycles = (highest - ep) // -drain + 1
+            else:
+                cycles = left // 2
+            cycles = min(cycles, left // 2)
+            ep -= cycles * drain
+            applied += cycles * (r0 + r1)
+            turn += cycles * 2
+            left -= cycles * 2
+            continue
+
+        start = ep
+        cycle_exhausted = []
+        cycle_applied = 0
+        for offset in (0, 1):
+            ep, exhausted, step_applied = step(ep, turn + offset)
+            cycle_applied += step_applied
+            if exhausted:
+                cycle_exhausted.append(turn + offset)
+        applied += cycle_applied
+        turn += 2
+        left -= 2
+        if cycle_exhausted:
+            if exhausted_turn is None:
+                exhausted_turn = cycle_exhausted[0]
+            exhausted_turns += len(cycle_exhausted)
+        if ep == start:
+            # Fixed point: every remaining full cycle is this one again
+            cycles = left // 2
+            exhausted_turns += cycles * len(cycle_exhausted)
+            applied += cycles * cycle_applied
+            turn += cycles * 2
+            left -= cycles * 2
+
+    return {
+        "current_ep": float(ep),
+        "turn_count": turn,
+        "exhausted_turn": exhausted_turn,
+        "exhausted_turns": exhausted_turns,
+        "regen_gained": regen_turns_between(turn_count, turns, deactivated_regen) * float(regen),
+        "regen_applied": float(applied),
+    }
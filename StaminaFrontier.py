@@ -0,0 +1,207 @@
+import os
+import tempfile
+
+import numpy as np
+
+from StaminaCompare import PROJECTION_TURNS, price_columns
+from StaminaEngine import DEFAULT_LOADOUT, DEFAULT_PROFILE, RULE_PROFILES, fast_forward, max_ep_for
+from StaminaRules import current_rules
+
+# Build advice: the loadouts that are not beaten on every count by another.
+# A loadout is scored on EP cost per turn (lower is better), turns it can be
+# sustained from full EP, and its raw stat total (Power Use 1/2, Range,
+# Mobility and Control summed); the frontier is every loadout no other one
+# matches or beats on all three.
+#
+# Sustained turns only fall as the cost rises, so one loadout beats another
+# exactly when it costs no more and has no fewer stat points.  That is a 2D
+# skyline: sort by cost, then keep the loadouts that raise the best stat
+# total seen so far.  Neither cost nor stat total depends on Endurance, so
+# the frontier loadouts are the same at every Endurance; only their turns
+# differ, and those are stored per Endurance.
+#
+# The sweep prices every combination of the listed table levels, one numpy
+# pass per level of the first stat, so only levels^4 loadouts are in memory
+# at a time (a loadout off its slice's skyline is off the whole skyline, so
+# only each slice's skyline is kept).  It still takes levels^5 pricings, so
+# the page never sweeps: the result is saved next to this file by this
+# script or StaminaWarmup.py, and the page only reads it (load_frontier),
+# showing no advice while the file is missing or from other rules.
+#
+#   python StaminaFrontier.py [--endurance 5] [--max-cost 10] [--min-turns 20] [--profile anthesis]
+
+FRONTIER_VERSION = 1
+FRONTIER_DIR = os.path.dirname(os.path.abspath(__file__))
+SWEPT_STATS = ("power1", "power2", "range_stat", "mobility_stat", "control")
+
+
+# ----- Build -----
+def sweep_costs(levels, first, profile=DEFAULT_PROFILE, rules=None):
+    # Every combination of 0..levels-1 for the swept stats with the first one
+    # at `first`, all active, no upkeep or extras
+    rest = np.indices((levels,) * (len(SWEPT_STATS) - 1), dtype=np.int16).reshape(len(SWEPT_STATS) - 1, -1)
+    count = rest.shape[1]
+    grid = np.vstack([np.full((1, count), first, dtype=np.int16), rest])
+    columns = {field: np.full(count, value) for field, value in DEFAULT_LOADOUT._asdict().items()}
+    columns.update(zip(SWEPT_STATS, grid))
+    return grid, price_columns(columns, profile, rules)["total_cost"]
+
+
+def skyline(cost, stat_total):
+    # Indices of the points no other point matches or beats on both lower cost and higher stat total
+    order = np.lexsort((-stat_total, cost))
+    cost, stat_total = cost[order], stat_total[order]
+    starts = np.flatnonzero(np.r_[True, cost[1:] != cost[:-1]])
+    group_best = stat_total[starts]  # best stat total at each cost, thanks to the sort
+    best_before = np.r_[-1, np.maximum.accumulate(group_best)[:-1]]
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+    keep = (group_best > best_before)[group] & (stat_total == group_best[group])
+    return order[keep]
+
+
+def sustained_turns(max_ep, costs):
+    # Turns paid in full starting from max EP on turn 1; inf if it never runs out
+    turns = {}
+    for cost in np.unique(costs):
+        exhausted_turn = fast_forward(max_ep, 1, max_ep, float(cost), PROJECTION_TURNS)["exhausted_turn"]
+        turns[cost] = np.inf if exhausted_turn is None else exhausted_turn - 1
+    return np.array([turns[cost] for cost in costs], dtype=float)
+
+
+def build_frontier(profile=DEFAULT_PROFILE, rules=None):
+    rules = rules or current_rules()
+    levels = len(rules.ep_cost.table)
+    slices = []
+    for first in range(levels):
+        grid, cost = sweep_costs(levels, first, profile, rules)
+        kept = skyline(cost, grid.sum(axis=0, dtype=np.int32))
+        slices.append((grid[:, kept], cost[kept]))
+    grid = np.concatenate([grid for grid, _ in slices], axis=1)
+    cost = np.concatenate([cost for _, cost in slices])
+    stat_total = grid.sum(axis=0, dtype=np.int32)
+    kept = skyline(cost, stat_total)
+    cost = cost[kept]
+    return {
+        "version": np.array(FRONTIER_VERSION),
+        "fingerprint": np.array(rules.fingerprint),
+        "profile": np.array(profile),
+        "levels": grid[:, kept].T.astype(np.uint16),
+        "total_cost": cost,
+        "stat_total": stat_total[kept],
+        "turns": np.array([
+            sustained_turns(max_ep_for(endurance, rules), cost)
+            for endurance in range(len(rules.endurance_to_max_ep.table))
+        ]),
+    }
+
+
+def frontier_path(profile):
+    return os.path.join(FRONTIER_DIR, f"stamina_frontier_{profile}.npz")
+
+
+def save_frontier(arrays, path):
+    # Write next to the target under a name no other writer uses, then swap
+    # in, so readers never see half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ----- Query -----
+class Frontier:
+    def __init__(self, arrays):
+        self.fingerprint = str(arrays["fingerprint"])
+        self.profile = str(arrays["profile"])
+        self.levels = arrays["levels"]
+        self.total_cost = arrays["total_cost"]
+        self.stat_total = arrays["stat_total"]
+        self.turns = arrays["turns"]
+
+    def __len__(self):
+        return len(self.total_cost)
+
+    def turns_at(self, endurance):
+        if endurance < len(self.turns):
+            return self.turns[endurance]
+        return sustained_turns(max_ep_for(endurance), self.total_cost)
+
+    def query(self, endurance, max_cost=None, min_turns=None, min_stat_total=None, min_levels=None, limit=None):
+        # Frontier loadouts passing every filter, cheapest first; min_levels maps stat field -> lowest level
+        turns = self.turns_at(endurance)
+        mask = np.ones(len(self), dtype=bool)
+        if max_cost is not None:
+            mask &= self.total_cost <= max_cost
+        if min_turns is not None:
+            mask &= turns >= min_turns
+        if min_stat_total is not None:
+            mask &= self.stat_total >= min_stat_total
+        for field, level in (min_levels or {}).items():
+            mask &= self.levels[:, SWEPT_STATS.index(field)] >= level
+
+        rows = []
+        for i in np.flatnonzero(mask)[:limit]:
+            row = {field: int(level) for field, level in zip(SWEPT_STATS, self.levels[i])}
+            row["stat_total"] = int(self.stat_total[i])
+            row["total_cost"] = float(self.total_cost[i])
+            row["turns"] = None if np.isinf(turns[i]) else int(turns[i])
+            rows.append(row)
+        return rows
+
+
+_frontiers = {}  # profile -> Frontier
+
+
+def load_frontier(profile=DEFAULT_PROFILE):
+    # From memory, else from disk; None if the file is missing or from other
+    # rules.  Never sweeps, so it is safe on the page's render path.
+    fingerprint = current_rules().fingerprint
+    frontier = _frontiers.get(profile)
+    if frontier is None or frontier.fingerprint != fingerprint:
+        frontier = None
+        try:
+            with np.load(frontier_path(profile)) as saved:
+                if int(saved["version"]) == FRONTIER_VERSION and str(saved["fingerprint"]) == fingerprint:
+                    frontier = Frontier(dict(saved))
+        except (OSError, KeyError, ValueError):
+            pass
+        if frontier is None:
+            return None
+        _frontiers[profile] = frontier
+    return frontier
+
+
+def refresh_frontier(profile=DEFAULT_PROFILE):
+    # load_frontier, building and saving the file first if it is missing or stale
+    frontier = load_frontier(profile)
+    if frontier is None:
+        arrays = build_frontier(profile)
+        save_frontier(arrays, frontier_path(profile))
+        frontier = _frontiers[profile] = Frontier(arrays)
+    return frontier
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the Pareto frontier of loadouts for one Endurance")
+    parser.add_argument("--endurance", type=int, default=DEFAULT_LOADOUT.endurance)
+    parser.add_argument("--max-cost", type=float)
+    parser.add_argument("--min-turns", type=int)
+    parser.add_argument("--min-stat-total", type=int)
+    parser.add_argument("--limit", type=int, default=40)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(RULE_PROFILES))
+    args = parser.parse_args()
+
+    frontier = refresh_frontier(args.profile)
+    rows = frontier.query(args.endurance, args.max_cost, args.min_turns, args.min_stat_total, limit=args.limit)
+    print(f"{len(frontier)} frontier loadouts ({args.profile} rules); showing {len(rows)} at Endurance {args.endurance}")
+    print("  ".join(name.rjust(13) for name in (*SWEPT_STATS, "stat_total", "total_cost", "turns")))
+    for row in rows:
+        print("  ".join(str("never out" if value is None else value).rjust(13) for value in row.values()))
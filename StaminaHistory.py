@@ -0,0 +1,174 @@
+from array import array
+
+import streamlit as st
+
+# Per-turn history kept in session state.  Recent turns live in a fixed-size
+# ring buffer; turns that fall out of it are folded into min/max/mean buckets.
+# When the bucket archive fills up, neighbouring buckets are merged and each
+# bucket covers twice as many turns, so memory per session stays constant
+# whether a session lasts 20 turns or 20,000.
+
+HISTORY_WINDOW = 100
+ARCHIVE_BUCKETS = 64
+BUCKET_TURNS = 10
+
+
+class TurnHistory:
+    def __init__(self, capacity=HISTORY_WINDOW, archive_capacity=ARCHIVE_BUCKETS, bucket_turns=BUCKET_TURNS):
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.turns = array("q", [0] * capacity)
+        self.regen = array("d", [0.0] * capacity)
+        self.cost = array("d", [0.0] * capacity)
+        self.ep_after = array("d", [0.0] * capacity)
+
+        # Archive buckets: first turn, turn count, min/max/mean EP, regen and cost totals
+        self.archive_capacity = archive_capacity
+        self.bucket_turns = bucket_turns
+        self.archived = 0
+        self.bucket_first = array("q", [0] * archive_capacity)
+        self.bucket_count = array("q", [0] * archive_capacity)
+        self.bucket_min = array("d", [0.0] * archive_capacity)
+        self.bucket_max = array("d", [0.0] * archive_capacity)
+        self.bucket_mean = array("d", [0.0] * archive_capacity)
+        self.bucket_regen = array("d", [0.0] * archive_capacity)
+        self.bucket_cost = array("d", [0.0] * archive_capacity)
+
+    def __len__(self):
+        return self.size
+
+    # ----- Recording -----
+    def append(self, turn, regen_amount, total_cost, ep_after):
+        if self.size == self.capacity:
+            self.archive_oldest()
+        i = (self.start + self.size) % self.capacity
+        self.turns[i] = turn
+        self.regen[i] = regen_amount
+        self.cost[i] = total_cost
+        self.ep_after[i] = ep_after
+        self.size += 1
+
+    def archive_oldest(self):
+        i = self.start
+        self.start = (self.start + 1) % self.capacity
+        self.size -= 1
+
+        last = self.archived - 1
+        if last < 0 or self.bucket_count[last] >= self.bucket_turns:
+            if self.archived == self.archive_capacity:
+                self.merge_buckets()
+            last = self.archived
+            self.archived += 1
+            self.bucket_first[last] = self.turns[i]
+            self.bucket_count[last] = 0
+            self.bucket_min[last] = self.ep_after[i]
+            self.bucket_max[last] = self.ep_after[i]
+            self.bucket_mean[last] = 0.0
+            self.bucket_regen[last] = 0.0
+            self.bucket_cost[last] = 0.0
+
+        count = self.bucket_count[last] + 1
+        ep = self.ep_after[i]
+        self.bucket_count[last] = count
+        self.bucket_min[last] = min(self.bucket_min[last], ep)
+        self.bucket_max[last] = max(self.bucket_max[last], ep)
+        self.bucket_mean[last] += (ep - self.bucket_mean[last]) / count
+        self.bucket_regen[last] += self.regen[i]
+        self.bucket_cost[last] += self.cost[i]
+
+    def merge_buckets(self):
+        # Halve the archive resolution: bucket 2k absorbs bucket 2k+1
+        merged = 0
+        for k in range(0, self.archived, 2):
+            self.bucket_first[merged] = self.bucket_first[k]
+            count = self.bucket_count[k]
+            low, high = self.bucket_min[k], self.bucket_max[k]
+            total_ep = self.bucket_mean[k] * count
+            regen, cost = self.bucket_regen[k], self.bucket_cost[k]
+            if k + 1 < self.archived:
+                other = self.bucket_count[k + 1]
+                low = min(low, self.bucket_min[k + 1])
+                high = max(high, self.bucket_max[k + 1])
+                total_ep += self.bucket_mean[k + 1] * other
+                regen += self.bucket_regen[k + 1]
+                cost += self.bucket_cost[k + 1]
+                count += other
+            self.bucket_count[merged] = count
+            self.bucket_min[merged] = low
+            self.bucket_max[merged] = high
+            self.bucket_mean[merged] = total_ep / count
+            self.bucket_regen[merged] = regen
+            self.bucket_cost[merged] = cost
+            merged += 1
+        self.archived = merged
+        self.bucket_turns *= 2
+
+    # ----- Reading -----
+    def recent(self):
+        rows = []
+        for n in range(self.size):
+            i = (self.start + n) % self.capacity
+            rows.append((self.turns[i], self.regen[i], self.cost[i], self.ep_after[i]))
+        return rows
+
+    def last(self):
+        if self.size == 0:
+            return None
+        i = (self.start + self.size - 1) % self.capacity
+        return (self.turns[i], self.regen[i], self.cost[i], self.ep_after[i])
+
+    def archive(self):
+        return [
+            {
+                "first_turn": self.bucket_first[k],
+                "turns": self.bucket_count[k],
+                "min_ep": self.bucket_min[k],
+                "max_ep": self.bucket_max[k],
+                "mean_ep": self.bucket_mean[k],
+                "regen": self.bucket_regen[k],
+                "cost": self.bucket_cost[k],
+            }
+            for k in range(self.archived)
+        ]
+
+
+# ----- Session State Helpers -----
+def init_history(starting_ep, turn=1):
+    if "ep_history" not in st.session_state:
+        reset_history(starting_ep, turn)
+
+
+def record_turn(ep, turn=None, regen_amount=0, total_cost=0):
+    history = st.session_state.ep_history
+    if turn is None:
+        previous = history.last()
+        turn = previous[0] + 1 if previous else 1
+    history.append(turn, regen_amount, total_cost, ep)
+
+
+def reset_history(ep, turn=0):
+    st.session_state.ep_history = TurnHistory()
+    st.session_state.ep_history.append(turn, 0, 0, ep)
+
+
+def history_chart():
+    history = st.session_state.ep_history
+    rows = history.recent()
+    st.line_chart(
+        {"Turn": [row[0] for row in rows], "EP": [row[3] for row in rows]},
+        x="Turn",
+        y="EP",
+    )
+    buckets = history.archive()
+    if buckets:
+        st.caption(f"Turns {buckets[0]['first_turn']} to {rows[0][0] - 1} (min / mean / max EP)")
+        st.line_chart(
+            {
+                "Turn": [b["first_turn"] for b in buckets],
+                "Min EP": [b["min_ep"] for b in buckets],
+                "Mean EP": [b["mean_ep"] for b in buckets],
+                "Max EP": [b["max_ep"] for b in buckets],
+            },
+            x="Turn",
+        )
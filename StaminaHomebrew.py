@@ -0,0 +1,43 @@
+from StaminaPlugins import cost_rule
+
+# Homebrew extra costs for our table, loaded by StaminaPlugins.  Each rule
+# lists the inputs it reads; see StaminaPlugins for the contract.
+
+TERRAIN_COST = {"Normal": 0, "Difficult": 0.5, "Hazardous": 1}  # EP per square moved
+
+
+@cost_rule(
+    "Terrain",
+    uses=("mobility_inactive",),
+    params={"terrain": list(TERRAIN_COST), "squares": 0},
+    help="Moving through rough ground costs extra per square",
+)
+def terrain(state, terrain, squares):
+    if state.mobility_inactive:
+        return 0
+    return TERRAIN_COST[terrain] * squares
+
+
+@cost_rule(
+    "Overcharge",
+    uses=("power1_inactive", "regen_turn"),
+    params={"levels": 0},
+    help="Push Power Use 1 past its level: 2 EP per level, 3 EP on a turn without regen",
+)
+def overcharge(state, levels):
+    if state.power1_inactive:
+        return 0
+    return levels * (2 if state.regen_turn else 3)
+
+
+@cost_rule(
+    "Combo chain",
+    uses=("power1_inactive", "power2_inactive"),
+    params={"chain": 1},
+    help="Each link after the first in a chain of power uses costs 0.5 EP more than the last",
+)
+def combo_chain(state, chain):
+    if state.power1_inactive and state.power2_inactive:
+        return 0
+    links = max(chain - 1, 0)
+    return 0.25 * links * (links + 1)
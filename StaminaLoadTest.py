@@ -0,0 +1,328 @@
+import argparse
+import csv
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+# Load generator for a calculator script served by `streamlit run`.
+#
+#   python StaminaLoadTest.py [--app SCRIPT] [--sessions 1,5,10,25] [--duration 30] [--warmup]
+#
+# Each simulated player opens its own websocket session, the same way a
+# browser tab does, and plays through a random mix of stat slider edits,
+# Inactive toggles, Next Turn bursts and Resets.  A fresh server is started
+# for every session count, so memory figures are not carried over.  With
+# --warmup the server is started through StaminaWarmup.py instead.
+#
+# Reported per session count: reruns per second, rerun latency percentiles
+# (request sent to script finished), bytes received per rerun and server RSS,
+# idle and peak.  Like a browser, each session tells the server which cached
+# elements it already holds, so unchanged elements come back as hashes.
+
+DEFAULT_APP = "AnthesisFinaleBUTFORREALTHISTIMEIPROMISEVERSION2.py"
+DEFAULT_PORT = 8599
+WARMUP_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "StaminaWarmup.py")
+STARTUP_TIMEOUT = 60.0  # seconds to wait for the server's health check
+RSS_INTERVAL = 0.25  # seconds between server memory samples
+
+# Sliders made by stat_slider_with_inactive, and their Inactive checkboxes
+STAT_SLIDERS = ("Power Use 1", "Power Use 2", "Range", "Control", "Mobility")
+
+# Relative weights of the actions a player takes between pauses
+ACTIONS = {
+    "slider": 5,
+    "inactive": 1,
+    "next_turn_burst": 3,
+    "reset": 1,
+}
+BURST_TURNS = (3, 8)
+
+
+# ----- Server -----
+def start_server(app, port, warmup=False):
+    launcher = [WARMUP_LAUNCHER] if warmup else ["-m", "streamlit", "run"]
+    process = subprocess.Popen(
+        [
+            sys.executable, *launcher, app,
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--browser.gatherUsageStats", "false",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"streamlit did not answer on port {port} within {STARTUP_TIMEOUT:.0f}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def rss_bytes(pid):
+    # Resident memory from /proc (Linux); None elsewhere
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssMonitor(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(RSS_INTERVAL):
+            rss = rss_bytes(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# ----- Simulated Player -----
+class Session:
+    # One browser tab: keeps the widget values it has changed and sends them
+    # with every rerun, as the frontend does
+    def __init__(self, ws, rng):
+        self.ws = ws
+        self.rng = rng
+        self.widgets = {}  # widget key (or button label) -> element proto
+        self.states = {}  # widget id -> WidgetState to send
+        self.cached = set()  # hashes of cacheable messages received so far
+        self.latencies = []
+        self.received = []  # bytes per rerun
+        self.errors = 0
+
+    def rerun(self, trigger=None):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.cached_message_hashes.extend(self.cached)
+        for state in self.states.values():
+            msg.rerun_script.widget_states.widgets.append(state)
+        if trigger is not None:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = trigger
+            state.trigger_value = True
+
+        started = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        received = 0
+        while True:
+            raw = self.ws.recv()
+            received += len(raw)
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            if forward.metadata.cacheable:
+                self.cached.add(forward.hash)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                self.note_widget(forward.delta)
+            elif kind == "script_finished":
+                break
+        self.latencies.append(time.perf_counter() - started)
+        self.received.append(received)
+
+    def note_widget(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors += 1
+        elif kind in ("slider", "checkbox", "button"):
+            widget = getattr(element, kind)
+            # Widget ids end with the widget key, or "None" for keyless widgets
+            key = widget.id.split("-", 2)[-1]
+            self.widgets[widget.label if key == "None" else key] = widget
+
+    def set_slider(self, label, value):
+        widget = self.widgets[label]
+        state = self.states.setdefault(widget.id, self.new_state(widget.id))
+        del state.double_array_value.data[:]
+        state.double_array_value.data.append(value)
+        self.rerun()
+
+    def toggle(self, key):
+        widget = self.widgets[key]
+        state = self.states.get(widget.id)
+        current = state.bool_value if state is not None else widget.default
+        state = self.states.setdefault(widget.id, self.new_state(widget.id))
+        state.bool_value = not current
+        self.rerun()
+
+    def click(self, label):
+        self.rerun(trigger=self.widgets[label].id)
+
+    @staticmethod
+    def new_state(widget_id):
+        msg = BackMsg()
+        state = msg.rerun_script.widget_states.widgets.add()
+        state.id = widget_id
+        return state
+
+    def play_action(self):
+        rng = self.rng
+        action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        label = rng.choice(STAT_SLIDERS)
+        if action == "slider" and label in self.widgets:
+            slider = self.widgets[label]
+            self.set_slider(label, rng.randint(int(slider.min), int(slider.max)))
+        elif action == "inactive" and f"inactive_{label}" in self.widgets:
+            self.toggle(f"inactive_{label}")
+        elif action == "next_turn_burst" and "Next Turn" in self.widgets:
+            for _ in range(rng.randint(*BURST_TURNS)):
+                self.click("Next Turn")
+        elif action == "reset" and "Reset" in self.widgets:
+            self.click("Reset")
+        else:
+            self.rerun()
+
+
+def open_session(port):
+    return connect(f"ws://localhost:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+
+
+def play(port, seed, stop_at, think, results, ready):
+    session = Session(None, random.Random(seed))
+    try:
+        with open_session(port) as session.ws:
+            session.rerun()  # first page load
+            ready.wait()
+            while time.monotonic() < stop_at:
+                session.play_action()
+                if think:
+                    time.sleep(session.rng.expovariate(1 / think))
+    except Exception as err:
+        session.errors += 1
+        print(f"session {seed}: {err!r}", file=sys.stderr)
+    finally:
+        results.append(session)
+
+
+# ----- Runs -----
+def run_level(app, port, sessions, duration, think, warmup=False):
+    process = start_server(app, port, warmup)
+    try:
+        # One page load first, so imports and first-run caches are not billed to the sessions
+        with open_session(port) as ws:
+            Session(ws, None).rerun()
+        idle = rss_bytes(process.pid)
+        monitor = RssMonitor(process.pid)
+        monitor.start()
+
+        results = []
+        ready = threading.Event()
+        stop_at = time.monotonic() + duration
+        players = [
+            threading.Thread(target=play, args=(port, seed, stop_at, think, results, ready), daemon=True)
+            for seed in range(sessions)
+        ]
+        for player in players:
+            player.start()
+        started = time.perf_counter()
+        ready.set()
+        for player in players:
+            player.join()
+        elapsed = time.perf_counter() - started
+        monitor.stop()
+    finally:
+        stop_server(process)
+
+    # The first page load of each session happens before the clock starts
+    latencies = sorted(latency for session in results for latency in session.latencies[1:])
+    received = [size for session in results for size in session.received[1:]]
+    errors = sum(session.errors for session in results)
+    return summarize(sessions, elapsed, latencies, received, errors, idle, monitor.peak)
+
+
+def percentile(ordered, share):
+    if not ordered:
+        return None
+    if len(ordered) == 1:
+        return ordered[0]
+    return statistics.quantiles(ordered, n=100, method="inclusive")[int(share * 100) - 1]
+
+
+def summarize(sessions, elapsed, latencies, received, errors, idle, peak):
+    megabytes = 1024 * 1024
+    return {
+        "Sessions": sessions,
+        "Reruns": len(latencies),
+        "Errors": errors,
+        "Reruns/s": round(len(latencies) / elapsed, 1),
+        "p50 ms": ms(percentile(latencies, 0.50)),
+        "p90 ms": ms(percentile(latencies, 0.90)),
+        "p99 ms": ms(percentile(latencies, 0.99)),
+        "Max ms": ms(latencies[-1] if latencies else None),
+        "KB/rerun": round(statistics.fmean(received) / 1024, 1) if received else None,
+        "Idle RSS MB": None if idle is None else round(idle / megabytes, 1),
+        "Peak RSS MB": None if peak is None else round(peak / megabytes, 1),
+        "RSS/session MB": None if idle is None or peak is None else round((peak - idle) / sessions / megabytes, 2),
+    }
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def print_table(rows):
+    columns = list(rows[0])
+    widths = [max(len(name), *(len(str(row[name])) for row in rows)) for name in columns]
+    print("  ".join(name.rjust(width) for name, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[name]).rjust(width) for name, width in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for a calculator script")
+    parser.add_argument("--app", default=DEFAULT_APP)
+    parser.add_argument("--sessions", default="1,5,10,25", help="comma-separated session counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per session count")
+    parser.add_argument("--think", type=float, default=0.5, help="mean pause between actions, in seconds")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--csv", help="also write the results to this CSV file")
+    parser.add_argument("--warmup", action="store_true", help="start the server through StaminaWarmup.py")
+    args = parser.parse_args()
+
+    rows = []
+    for sessions in (int(count) for count in args.sessions.split(",")):
+        rows.append(run_level(os.path.abspath(args.app), args.port, sessions, args.duration, args.think, args.warmup))
+        print(f"{sessions} sessions: {rows[-1]['Reruns/s']} reruns/s, p90 {rows[-1]['p90 ms']} ms", file=sys.stderr)
+    print_table(rows)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {args.csv}")
@@ -0,0 +1,290 @@
+import bisect
+import os
+import sys
+import threading
+import urllib.request
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Counters and histograms for the running calculator, served in the
+# Prometheus text format on a local port:
+#
+#   curl http://127.0.0.1:9464/metrics
+#   python StaminaMetrics.py [--port 9464]    (scrapes once and prints the samples)
+#
+# Updates come from the script hot paths on every rerun, so each one is an
+# add under the metric's own lock with nothing else held: no formatting, no
+# I/O.  Cache hit rates and live sessions are read when the endpoint is
+# scraped, not on every lookup, and session_state size is re-measured every
+# few reruns rather than on each one.  The endpoint listens on 127.0.0.1 only and
+# is started once per server process, by whichever session gets there first.
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("STAMINA_METRICS_PORT", "9464"))  # 0 turns the endpoint off
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+STATE_SAMPLE_EVERY = 16  # reruns between session_state size measurements (one takes ~1 ms)
+
+registry = []
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}  # label values -> count
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # label values -> [count per bucket..., count above the last, sum]
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            cell = self.values.get(label_values)
+            if cell is None:
+                cell = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            cell[i] += 1
+            cell[-1] += value
+
+    def samples(self):
+        with self.lock:
+            values = [(label_values, list(cell)) for label_values, cell in self.values.items()]
+        for label_values, cell in values:
+            labels = dict(zip(self.labels, label_values))
+            running = 0
+            for bound, count in zip(self.buckets, cell):
+                running += count
+                yield f"{self.name}_bucket", {**labels, "le": format_value(bound)}, running
+            running += cell[-2]
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, running
+            yield f"{self.name}_count", labels, running
+            yield f"{self.name}_sum", labels, cell[-1]
+
+
+class Collected:
+    # A metric read from elsewhere at scrape time; collect() yields (labels, value)
+    def __init__(self, name, help_text, kind, collect):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.collect = collect
+        registry.append(self)
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, labels, value
+
+
+# ----- Caches -----
+watched_caches = {}  # name -> LRUCache
+
+
+def watch_cache(name, cache):
+    watched_caches[name] = cache
+
+
+def cache_samples(field):
+    def collect():
+        for name, cache in list(watched_caches.items()):
+            yield {"cache": name}, cache.stats()[field]
+    return collect
+
+
+# ----- Sessions -----
+class SessionMetrics:
+    # Kept in a session's state; when Streamlit drops the session, this goes
+    # with it and the session stops counting as active
+    __slots__ = ("reruns", "state_bytes", "__weakref__")
+
+    def __init__(self):
+        self.reruns = 0
+        self.state_bytes = 0
+
+
+live_sessions = weakref.WeakSet()
+
+
+def track_session(session_state):
+    # Called once per rerun with st.session_state
+    session = session_state.get("metrics_session")
+    if session is None:
+        session = SessionMetrics()
+        live_sessions.add(session)
+        session_state["metrics_session"] = session
+    if session.reruns % STATE_SAMPLE_EVERY == 0:
+        session.state_bytes = state_size(session_state.to_dict())
+    session.reruns += 1
+
+
+def session_samples(summarize):
+    def collect():
+        sizes = [session.state_bytes for session in list(live_sessions)]
+        yield {}, summarize(sizes) if sizes else 0
+    return collect
+
+
+def state_size(value, seen=None):
+    # Approximate bytes held by a session's state, following containers and
+    # object attributes; shared objects are counted once
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(state_size(k, seen) + state_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(state_size(item, seen) for item in value)
+    elif type(value).__sizeof__ is not object.__sizeof__:
+        pass  # arrays, DataFrames and the like already count their own buffers
+    elif hasattr(value, "__dict__"):
+        size += state_size(vars(value), seen)
+    elif hasattr(type(value), "__slots__"):
+        size += sum(
+            state_size(getattr(value, slot), seen)
+            for slot in type(value).__slots__ if slot != "__weakref__" and hasattr(value, slot)
+        )
+    return size
+
+
+# ----- Metrics -----
+reruns = Counter("stamina_reruns_total", "Script reruns.", ("script",))
+next_turn_clicks = Counter("stamina_next_turn_clicks_total", "Next Turn clicks.", ("script",))
+reset_clicks = Counter("stamina_reset_clicks_total", "Reset clicks.", ("script",))
+cost_engine_seconds = Histogram(
+    "stamina_cost_engine_seconds", "Time spent pricing loadouts on a cache miss.", ("engine",)
+)
+Collected("stamina_active_sessions", "Sessions whose state is still held by the server.", "gauge",
+          session_samples(len))
+Collected("stamina_session_state_bytes", "Approximate session_state size, summed over sessions.", "gauge",
+          session_samples(sum))
+Collected("stamina_session_state_max_bytes", "Approximate session_state size of the largest session.", "gauge",
+          session_samples(max))
+Collected("stamina_cache_hits_total", "Cache hits.", "counter", cache_samples("hits"))
+Collected("stamina_cache_misses_total", "Cache misses.", "counter", cache_samples("misses"))
+Collected("stamina_cache_hit_ratio", "Cache hits over lookups since start.", "gauge", cache_samples("hit_rate"))
+Collected("stamina_cache_entries", "Entries in each cache.", "gauge", cache_samples("size"))
+
+
+# ----- Exposition -----
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render():
+    lines = []
+    for metric in list(registry):
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{key}="{escape_label(val)}"' for key, val in labels.items())
+                name = f"{name}{{{label_text}}}"
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the streamlit log
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    # Safe to call on every rerun; only the first call in a process binds the port
+    global _server
+    if _server is not None or not port:
+        return _server
+    with _server_lock:
+        if _server is None:
+            try:
+                server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as err:
+                print(f"Metrics endpoint not started on {host}:{port}: {err}", file=sys.stderr)
+                server = False  # do not retry on every rerun
+            else:
+                server.daemon_threads = True
+                threading.Thread(
+                    target=server.serve_forever, name="stamina-metrics", daemon=True
+                ).start()
+            _server = server
+    return _server
+
+
+# ----- Scraping -----
+def parse_metrics(text):
+    # Text format -> {(name, ((label, value), ...)): value}; comments are skipped
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, label_text = series.partition("{")
+        labels = []
+        for pair in label_text.rstrip("}").split('",') if label_text else []:
+            key, _, val = pair.partition('="')
+            labels.append((key, val.rstrip('"').replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\")))
+        samples[(name, tuple(labels))] = float(value)
+    return samples
+
+
+def scrape(port=METRICS_PORT, host=METRICS_HOST, timeout=5):
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=timeout) as response:
+        return parse_metrics(response.read().decode("utf-8"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape the calculator's metrics endpoint once")
+    parser.add_argument("--host", default=METRICS_HOST)
+    parser.add_argument("--port", type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    for (name, labels), value in sorted(scrape(args.port, args.host).items()):
+        label_text = ", ".join(f"{key}={val}" for key, val in labels)
+        print(f"{name}{{{label_text}}} {format_value(value)}" if labels else f"{name} {format_value(value)}")
@@ -0,0 +1,225 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from StaminaEngine import (
+    DEFAULT_LOADOUT,
+    compute_total,
+    max_ep_for,
+    regen_for_turn,
+)
+from StaminaRules import current_rules
+
+# Encounter plans written as text, e.g.
+#   "turns 1-3: Power Use 1 at 6 with upkeep; turn 4: Mobility inactive, extra 2.5"
+# Each segment changes the base loadout for the turns it names only; turns
+# that no segment names use the base loadout unchanged.  A plan is compiled
+# once into per-turn cost and regen arrays and then evaluated over the arrays
+# without re-pricing.  Plans are typed into a shared page, so they stop at
+# MAX_PLAN_TURNS.
+
+MAX_PLAN_TURNS = 1000
+
+# ----- Stat Names -----
+STAT_NAMES = {
+    "power use 1": "power1",
+    "power 1": "power1",
+    "power1": "power1",
+    "power use 2": "power2",
+    "power 2": "power2",
+    "power2": "power2",
+    "range": "range_stat",
+    "control": "control",
+    "mobility": "mobility_stat",
+    "buff": "buff_debuff",
+    "buff/debuff": "buff_debuff",
+    "stat buff/debuff": "buff_debuff",
+}
+INACTIVE_FIELDS = {
+    "power1": "power1_inactive",
+    "power2": "power2_inactive",
+    "range_stat": "range_inactive",
+    "control": "control_inactive",
+    "mobility_stat": "mobility_inactive",
+}
+UPKEEP_FIELDS = {
+    "power1": "upkeep1",
+    "power2": "upkeep2",
+    "buff_debuff": "upkeep_buff",
+}
+
+SEGMENT_RE = re.compile(r"^turns?\s+(\d+)(?:\s*-\s*(\d+))?\s*:(.*)$")
+AT_RE = re.compile(r"^(.+?)\s+at\s+(\d+)(\s+with\s+upkeep)?$")
+STATE_RE = re.compile(r"^(.+?)\s+(inactive|active)$")
+UPKEEP_RE = re.compile(r"^(.+?)\s+with\s+upkeep$")
+EXTRA_RE = re.compile(r"^extra\s+(-?\d+(?:\.\d+)?)$")
+REGEN_RE = re.compile(r"^(?:regen deactivated|deactivated regen)$")
+
+CompiledPlan = namedtuple("CompiledPlan", ["text", "base", "costs", "always_regen", "max_ep"])
+
+
+# ----- Parsing -----
+def stat_field(name, clause):
+    field = STAT_NAMES.get(" ".join(name.split()))
+    if field is None:
+        raise ValueError(f"Unknown stat '{name}' in '{clause}'")
+    return field
+
+
+def parse_clause(clause):
+    clause = clause.strip()
+    text = " ".join(clause.lower().split())
+
+    match = AT_RE.match(text)
+    if match:
+        field = stat_field(match.group(1), clause)
+        level = int(match.group(2))
+        rules = current_rules()
+        max_level = rules.max_buff if field == "buff_debuff" else rules.max_stat
+        if level > max_level:
+            raise ValueError(f"Level {level} is above {max_level} in '{clause}'")
+        changes = {field: level}
+        if field in INACTIVE_FIELDS:
+            changes[INACTIVE_FIELDS[field]] = False
+        if match.group(3):
+            changes.update(upkeep_change(field, clause))
+        return changes
+
+    match = STATE_RE.match(text)
+    if match:
+        field = stat_field(match.group(1), clause)
+        if field not in INACTIVE_FIELDS:
+            raise ValueError(f"'{match.group(1)}' has no inactive toggle in '{clause}'")
+        return {INACTIVE_FIELDS[field]: match.group(2) == "inactive"}
+
+    match = UPKEEP_RE.match(text)
+    if match:
+        return upkeep_change(stat_field(match.group(1), clause), clause)
+
+    match = EXTRA_RE.match(text)
+    if match:
+        return {"extra_costs": float(match.group(1))}
+
+    if REGEN_RE.match(text):
+        return {"deactivated_regen": True}
+
+    raise ValueError(f"Could not read '{clause}'")
+
+
+def upkeep_change(field, clause):
+    if field not in UPKEEP_FIELDS:
+        raise ValueError(f"Upkeep is not allowed in '{clause}'")
+    return {UPKEEP_FIELDS[field]: True}
+
+
+def parse_plan(text):
+    # Returns [(first_turn, last_turn, changes), ...] in the order written
+    segments = []
+    for raw_segment in text.split(";"):
+        if not raw_segment.strip():
+            continue
+        match = SEGMENT_RE.match(raw_segment.strip().lower())
+        if not match:
+            raise ValueError(f"Expected 'turn N:' or 'turns A-B:' in '{raw_segment.strip()}'")
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) else first
+        if first < 1 or last < first:
+            raise ValueError(f"Bad turn range in '{raw_segment.strip()}'")
+        if last > MAX_PLAN_TURNS:
+            raise ValueError(f"Plans stop at turn {MAX_PLAN_TURNS} in '{raw_segment.strip()}'")
+        changes = {}
+        for clause in match.group(3).split(","):
+            if clause.strip():
+                changes.update(parse_clause(clause))
+        segments.append((first, last, changes))
+    return segments
+
+
+# ----- Compiling -----
+def turn_loadouts(text, base=DEFAULT_LOADOUT, turns=None):
+    # The loadout in effect on each turn of the plan, turn 1 first
+    segments = parse_plan(text)
+    if turns is None:
+        turns = max([last for _, last, _ in segments], default=0)
+    if turns > MAX_PLAN_TURNS:
+        raise ValueError(f"Plans stop at turn {MAX_PLAN_TURNS}, not {turns}")
+
+    overrides = [{} for _ in range(turns)]
+    for first, last, changes in segments:
+        for turn in range(first, min(last, turns) + 1):
+            overrides[turn - 1].update(changes)
+    return [base._replace(**changes) if changes else base for changes in overrides]
+
+
+def compile_plan(text, base=DEFAULT_LOADOUT, turns=None):
+    # Plans repeat the same few loadouts, so each distinct one is priced once
+    priced = {}
+    costs = []
+    always_regen = []
+    for loadout in turn_loadouts(text, base, turns):
+        if loadout not in priced:
+            priced[loadout] = compute_total(loadout)
+        costs.append(priced[loadout])
+        always_regen.append(loadout.deactivated_regen)
+
+    return CompiledPlan(
+        text, base, np.array(costs, dtype=float), np.array(always_regen, dtype=bool), max_ep_for(base.endurance)
+    )
+
+
+# ----- Evaluation -----
+def clamp_steps(ep_change, lowest, highest):
+    # Turn t maps EP x to clip(x + ep_change[t], lowest[t], highest[t]).  Maps of
+    # that form compose into one of the same form, so every turn's map from the
+    # starting EP is built in log2(turns) array passes (a prefix scan).
+    ep_change, lowest, highest = ep_change.copy(), lowest.copy(), highest.copy()
+    shift = 1
+    while shift < len(ep_change):
+        # Turns up to `shift` back, then this turn's map on top
+        later = slice(shift, None)
+        earlier = slice(None, -shift)
+        change = ep_change[later]
+        new_lowest = np.clip(lowest[earlier] + change, lowest[later], highest[later])
+        new_highest = np.clip(highest[earlier] + change, lowest[later], highest[later])
+        ep_change[later] = ep_change[earlier] + change
+        lowest[later] = new_lowest
+        highest[later] = new_highest
+        shift *= 2
+    return ep_change, lowest, highest
+
+
+def evaluate_plan(plan, current_ep=None, turn_count=1):
+    max_ep = plan.max_ep
+    ep = max_ep if current_ep is None else current_ep
+    costs = plan.costs
+    turns = len(costs)
+
+    # Each turn: regen, clamp to max, pay, clamp to 0 -- as next_turn does
+    regen_turn = plan.always_regen | ((turn_count + np.arange(turns)) % 2 == 0)
+    regen = np.where(regen_turn, regen_for_turn(max_ep, 0), 0)
+    ep_change, lowest, highest = clamp_steps(regen - costs, np.zeros(turns), np.maximum(max_ep - costs, 0))
+    ep_after = np.clip(ep + ep_change, lowest, highest)
+
+    ep_before = np.minimum(np.concatenate(([ep], ep_after[:-1])) + regen, max_ep)
+    short = np.flatnonzero(ep_before < costs)
+    final_ep = float(ep_after[-1]) if turns else ep
+
+    return {
+        "text": plan.text,
+        "turns": turns,
+        "total_spent": float(costs.sum()),
+        "final_ep": final_ep,
+        "lowest_ep": float(ep_after.min()) if turns else ep,
+        "exhausted_turn": int(short[0]) + 1 if len(short) else None,
+        "turn_count": turn_count + turns,
+        "ep_after": ep_after,
+    }
+
+
+def evaluate_plans(texts, base=DEFAULT_LOADOUT, current_ep=None, turn_count=1, turns=None):
+    # Batch form for comparing many NPC plans against the same starting state
+    return [
+        evaluate_plan(compile_plan(text, base, turns), current_ep, turn_count)
+        for text in texts
+    ]
@@ -0,0 +1,121 @@
+import importlib
+import importlib.util
+import math
+import os
+import sys
+from collections import namedtuple
+
+from StaminaCache import LRUCache
+from StaminaEngine import LOADOUT_FIELDS
+from StaminaMetrics import watch_cache
+
+# Homebrew cost rules as plugins.  A rule is a pure function of the loadout
+# and the turn state that returns EP to add to the turn (or take off, if
+# negative); the calculator adds every enabled rule's amount to Extra Costs,
+# so the sum goes through the same rounding rules as the rest of the cost.
+#
+#   from StaminaPlugins import cost_rule
+#
+#   @cost_rule("Difficult terrain", uses=("mobility_stat",), params={"squares": 0})
+#   def difficult_terrain(state, squares):
+#       return squares * 0.5
+#
+# A rule sees only the inputs it lists in `uses` (loadout fields and
+# TURN_FIELDS), plus its own params, which the calculator shows as widgets
+# from their defaults: bool -> checkbox, int/float -> number, list -> choice.
+# Because the inputs are all it can see, a cacheable rule is memoized on
+# exactly those, and reruns that leave them unchanged never call it again.
+#
+# Rules are contained rather than trusted: an exception, or a result that is
+# not a finite multiple of 0.25 EP, is reported for that rule and counts as
+# 0, and the calculator carries on.  This is not a security boundary; only
+# load plugin modules you would run yourself.
+#
+# Plugin modules come from STAMINA_PLUGINS (comma-separated module names or
+# .py paths), by default the bundled StaminaHomebrew.
+
+PLUGIN_MODULES = os.environ.get("STAMINA_PLUGINS", "StaminaHomebrew")
+TURN_FIELDS = ("turn_count", "current_ep", "max_ep", "regen_turn", "base_cost")
+
+TurnState = namedtuple("TurnState", TURN_FIELDS)
+CostRule = namedtuple("CostRule", ["name", "func", "uses", "params", "cacheable", "help", "state_type"])
+
+cost_rules = {}  # name -> CostRule, in registration order
+plugin_cache = LRUCache()
+watch_cache("plugins", plugin_cache)
+
+
+def cost_rule(name, uses=LOADOUT_FIELDS + TURN_FIELDS, params=None, cacheable=True, help=""):
+    # Decorator registering func(state, **params) -> EP
+    unknown = [field for field in uses if field not in LOADOUT_FIELDS + TURN_FIELDS]
+    if unknown:
+        raise ValueError(f"Cost rule '{name}' uses unknown inputs: {', '.join(unknown)}")
+    uses = tuple(uses)
+
+    def register(func):
+        # Registering a name again replaces the rule (Streamlit re-imports edited plugin modules)
+        state_type = namedtuple(f"{func.__name__}_state", uses)
+        cost_rules[name] = CostRule(name, func, uses, dict(params or {}), cacheable, help, state_type)
+        return func
+    return register
+
+
+def param_default(default):
+    # A list param is a choice between its items, defaulting to the first
+    return default[0] if isinstance(default, (list, tuple)) else default
+
+
+def check_amount(name, amount):
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
+        raise ValueError(f"'{name}' must return a number of EP, got {amount!r}")
+    if amount * 4 != int(amount * 4):
+        raise ValueError(f"'{name}' must return a multiple of 0.25 EP, got {amount}")
+    return amount
+
+
+def run_rule(rule, loadout, turn, params):
+    values = {**loadout._asdict(), **turn._asdict()}
+    state = rule.state_type(*(values[field] for field in rule.uses))
+    params = {key: params.get(key, param_default(default)) for key, default in rule.params.items()}
+
+    def call():
+        return check_amount(rule.name, rule.func(state, **params))
+
+    if not rule.cacheable:
+        return call()
+    # Keyed on the function too, so an edited and re-imported rule never sees old results
+    return plugin_cache.get((rule.name, rule.func, state, tuple(params.items())), call)
+
+
+def run_cost_rules(loadout, turn, enabled, params_by_rule=None):
+    # -> ({rule name: EP}, {rule name: error message}) for the enabled rules
+    amounts, errors = {}, {}
+    for name in enabled:
+        rule = cost_rules[name]
+        try:
+            amounts[name] = run_rule(rule, loadout, turn, (params_by_rule or {}).get(name, {}))
+        except Exception as err:  # a broken plugin must not take the calculator down
+            errors[name] = f"{type(err).__name__}: {err}"
+            amounts[name] = 0
+    return amounts, errors
+
+
+# ----- Loading -----
+plugin_errors = {}  # module -> error message
+
+
+def load_plugins(modules=PLUGIN_MODULES):
+    for module in (part.strip() for part in modules.split(",")):
+        if not module or module in plugin_errors or module in sys.modules:
+            continue
+        try:
+            if module.endswith(".py"):
+                spec = importlib.util.spec_from_file_location(os.path.basename(module)[:-3], module)
+                loaded = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(loaded)
+                sys.modules[module] = loaded
+            else:
+                importlib.import_module(module)
+        except Exception as err:  # reported in the calculator, like a bad rules file
+            plugin_errors[module] = f"{type(err).__name__}: {err}"
+    return cost_rules
@@ -0,0 +1,65 @@
+from StaminaEngine import regen_for_turn, regen_turns_between
+
+# Rests between encounters.  Resting is turns that regenerate on the usual
+# cadence (10% of max EP every other turn, or every turn with Deactivated
+# Regen) and spend nothing, so EP only climbs until it reaches max EP.  The
+# regen turns in any span have a closed form, which makes a rest of an hour
+# or a week O(1): one multiplication and one clamp.
+#
+# In-game time is turned into turns at SECONDS_PER_TURN.  Rests keep each
+# combatant's own turn count going, so regen parity carries on afterwards.
+
+SECONDS_PER_TURN = 6
+REST_LENGTHS = {  # rest -> minutes
+    "Short rest": 60,
+    "Long rest": 8 * 60,
+}
+
+
+def rest_turns(minutes):
+    return int(minutes * 60 // SECONDS_PER_TURN)
+
+
+def rest(current_ep, turn_count, max_ep, turns, deactivated_regen=False):
+    # Same result as `turns` Next Turns at cost 0.  regen_gained counts every
+    # regen, as fast_forward does; recovered is what EP actually went up by.
+    if turns <= 0:
+        return {"current_ep": current_ep, "turn_count": turn_count, "regen_gained": 0, "recovered": 0}
+    regen = regen_for_turn(max_ep, 2, deactivated_regen)  # the amount on a turn that regenerates
+    gained = regen * regen_turns_between(turn_count, turns, deactivated_regen)
+    new_ep = min(current_ep + gained, max_ep)
+    return {
+        "current_ep": new_ep,
+        "turn_count": turn_count + turns,
+        "regen_gained": gained,
+        "recovered": new_ep - min(current_ep, max_ep),
+    }
+
+
+def turns_to_full(current_ep, turn_count, max_ep, deactivated_regen=False):
+    # Fewest rest turns that bring EP to max; None if regen is 0 and EP is short
+    missing = max_ep - current_ep
+    if missing <= 0:
+        return 0
+    regen = regen_for_turn(max_ep, 2, deactivated_regen)
+    if regen <= 0:
+        return None
+    regens = -(-missing // regen)
+    if deactivated_regen:
+        return int(regens)
+    # Regen lands on even turns: from an even turn the k-th one is 2k - 1 turns in, from an odd turn 2k
+    return int(2 * regens - (turn_count % 2 == 0))
+
+
+def rest_party(combatants, turns):
+    # Rests everyone at once; each combatant needs current_ep, turn_count,
+    # max_ep and deactivated_regen.  Returns {name: EP recovered}.
+    recovered = {}
+    for combatant in combatants:
+        result = rest(
+            combatant.current_ep, combatant.turn_count, combatant.max_ep, turns, combatant.deactivated_regen
+        )
+        combatant.current_ep = result["current_ep"]
+        combatant.turn_count = result["turn_count"]
+        recovered[combatant.name] = result["recovered"]
+    return recovered
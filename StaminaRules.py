@@ -0,0 +1,276 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import tomllib
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+# Rule tables loaded from a versioned rules file (TOML or JSON) instead of
+# being copied into every script.  The file is validated and compiled into
+# typed arrays once per change.  A watcher thread polls the file and swaps a
+# new RuleSet in with a single assignment, so readers see the old tables or
+# the new ones, never a mix.  A file that fails validation is reported and
+# the tables in use are kept.
+#
+# Levels past the end of a table follow the table's [scaling] rule: the curve
+# continues from the last entry by a step that grows every few levels.  The
+# sum of that arithmetic run has a closed form, so any level costs O(1) with
+# no extended list, and the same formula works on numpy arrays for sweeps.
+
+RULES_PATH = os.environ.get(
+    "STAMINA_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "stamina_rules.toml"),
+)
+RULES_FORMAT_VERSION = 1
+WATCH_INTERVAL = 2.0  # seconds between checks of the rules file
+
+# The calculator sliders go this high, so a rules file may add levels but not remove them
+MIN_STAT_LEVELS = 14
+MIN_BUFF_LEVELS = 19
+MIN_ENDURANCE_LEVELS = 14
+MAX_LEVEL_CAP = 65535  # snapshots store levels as u16
+MAX_RULE_VALUE = 10 ** 6  # far past any real cost; keeps every extrapolated level in int64
+MEMO_SIZE = 256  # extrapolated levels remembered per table
+
+RuleSet = namedtuple("RuleSet", [
+    "version",
+    "ep_cost",
+    "control_reduction",
+    "buff_debuff",
+    "endurance_to_max_ep",
+    "max_stat",
+    "max_buff",
+    "max_endurance",
+    "fingerprint",
+    "generation",
+    "source",
+])
+
+
+# ----- Loading and Validation -----
+def read_rules_file(path):
+    with open(path, "rb") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return tomllib.load(f)
+
+
+def check_number(value, name):
+    # TOML and JSON both allow inf and nan, and JSON any size of integer
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{name}' must be a number, got {value!r}")
+    if not (math.isfinite(value) and 0 <= value <= MAX_RULE_VALUE):
+        raise ValueError(f"'{name}' must be a number from 0 to {MAX_RULE_VALUE}, got {value}")
+
+
+def scaling_rules(raw):
+    scaling = raw.get("scaling", {})
+    if not isinstance(scaling, dict):
+        raise ValueError("'scaling' must be a table")
+    return scaling
+
+
+def check_table(raw, name, min_length=1, integers=False):
+    values = raw.get(name)
+    if not isinstance(values, list) or len(values) < min_length:
+        raise ValueError(f"'{name}' must be a list of at least {min_length} numbers")
+    for i, value in enumerate(values):
+        check_number(value, f"{name}[{i}]")
+        if integers and value != int(value):
+            raise ValueError(f"'{name}[{i}]' must be a whole number, got {value}")
+        if value * 4 != int(value * 4):
+            raise ValueError(f"'{name}[{i}]' must be a multiple of 0.25, got {value}")
+    return values
+
+
+def typed(values):
+    # Whole-number tables stay integers so displayed values read "4", not "4.0"
+    if all(value == int(value) for value in values):
+        return array("q", (int(value) for value in values))
+    return array("d", values)
+
+
+def check_scaling(raw, name, values, integers=False):
+    # Defaults continue the table in a straight line from its last two entries
+    scaling = scaling_rules(raw).get(name, {})
+    if not isinstance(scaling, dict):
+        raise ValueError(f"'scaling.{name}' must be a table")
+    default_step = values[-1] - values[-2] if len(values) > 1 else 0
+    step = scaling.get("step", default_step)
+    growth = scaling.get("growth", 0)
+    every = scaling.get("every", 1)
+    for key, value in (("step", step), ("growth", growth)):
+        check_number(value, f"scaling.{name}.{key}")
+        if integers and value != int(value):
+            raise ValueError(f"'scaling.{name}.{key}' must be a whole number, got {value}")
+        if value * 4 != int(value * 4):
+            raise ValueError(f"'scaling.{name}.{key}' must be a multiple of 0.25, got {value}")
+    if isinstance(every, bool) or not isinstance(every, int) or every < 1:
+        raise ValueError(f"'scaling.{name}.every' must be a whole number of at least 1, got {every!r}")
+    return step, growth, every
+
+
+def check_level_cap(raw, name, tabled):
+    cap = scaling_rules(raw).get(name, tabled - 1)
+    if isinstance(cap, bool) or not isinstance(cap, int) or not tabled - 1 <= cap <= MAX_LEVEL_CAP:
+        raise ValueError(f"'scaling.{name}' must be a whole number from {tabled - 1} to {MAX_LEVEL_CAP}, got {cap!r}")
+    return cap
+
+
+class ScaledTable:
+    # A rule table indexed by level: listed levels come from the table, higher
+    # ones from the scaling rule.  Only indexing is supported, there is no end.
+    def __init__(self, values, step, growth, every):
+        whole = all(value == int(value) for value in (*values, step, growth))
+        self.table = typed(values)
+        self.last_level = len(values) - 1
+        self.last = self.table[-1]
+        self.step = int(step) if whole else step
+        self.growth = int(growth) if whole else growth
+        self.every = every
+        self.memo = {}
+
+    def __getitem__(self, level):
+        if level < 0:
+            raise IndexError(f"Level must not be negative, got {level}")
+        if level <= self.last_level:
+            return self.table[level]
+        value = self.memo.get(level)
+        if value is None:
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            value = self.memo[level] = self.extrapolate(level - self.last_level)
+        return value
+
+    def extrapolate(self, extra):
+        # The step for the j-th level past the table is step + growth * ((j - 1) // every);
+        # summed over j = 1..extra that is the closed form below
+        runs, rest = extra // self.every, extra % self.every
+        return self.last + self.step * extra + self.growth * (self.every * runs * (runs - 1) // 2 + rest * runs)
+
+    def lookup(self, levels):
+        # Vectorized indexing for numpy sweeps: same values as table[level] for each level
+        levels = np.asarray(levels)
+        extra = np.maximum(levels - self.last_level, 0)
+        listed = np.asarray(self.table)[np.minimum(levels, self.last_level)]
+        return listed - self.last + self.extrapolate(extra) if extra.any() else listed
+
+    def scaling(self):
+        return [self.step, self.growth, self.every]
+
+
+def compile_rules(raw, generation=0, source=None):
+    if not isinstance(raw, dict):
+        raise ValueError("Rules must be a table of settings")
+    if raw.get("format") != RULES_FORMAT_VERSION:
+        raise ValueError(f"Rules format must be {RULES_FORMAT_VERSION}, got {raw.get('format')!r}")
+    version = raw.get("version")
+    if not isinstance(version, str) or not version:
+        raise ValueError("Rules need a non-empty 'version' string")
+
+    ep_cost = check_table(raw, "ep_cost", MIN_STAT_LEVELS)
+    control_reduction = check_table(raw, "control_reduction", MIN_STAT_LEVELS)
+    buff_debuff = check_table(raw, "buff_debuff", MIN_BUFF_LEVELS)
+    endurance_to_max_ep = check_table(raw, "endurance_to_max_ep", MIN_ENDURANCE_LEVELS, integers=True)
+
+    if len(control_reduction) != len(ep_cost):
+        raise ValueError("'control_reduction' needs one entry per 'ep_cost' level")
+    if any(b < a for a, b in zip(ep_cost, ep_cost[1:])):
+        raise ValueError("'ep_cost' must not decrease as the stat goes up")
+    if buff_debuff[0] != 0:
+        raise ValueError("'buff_debuff[0]' must be 0 (no buff costs nothing)")
+
+    tables = {
+        "ep_cost": ScaledTable(ep_cost, *check_scaling(raw, "ep_cost", ep_cost)),
+        "control_reduction": ScaledTable(control_reduction, *check_scaling(raw, "control_reduction", control_reduction)),
+        "buff_debuff": ScaledTable(buff_debuff, *check_scaling(raw, "buff_debuff", buff_debuff)),
+        "endurance_to_max_ep": ScaledTable(
+            endurance_to_max_ep, *check_scaling(raw, "endurance_to_max_ep", endurance_to_max_ep, integers=True)
+        ),
+    }
+
+    # Identifies the table contents and scaling, for caches and artifacts built from them
+    fingerprint = hashlib.sha1(json.dumps(
+        [ep_cost, control_reduction, buff_debuff, endurance_to_max_ep]
+        + [table.scaling() for table in tables.values()]
+    ).encode()).hexdigest()[:16]
+
+    return RuleSet(
+        version=version,
+        **tables,
+        max_stat=check_level_cap(raw, "max_stat", len(ep_cost)),
+        max_buff=check_level_cap(raw, "max_buff", len(buff_debuff)),
+        max_endurance=check_level_cap(raw, "max_endurance", len(endurance_to_max_ep)),
+        fingerprint=fingerprint,
+        generation=generation,
+        source=source,
+    )
+
+
+def load_rules(path=RULES_PATH, generation=0):
+    return compile_rules(read_rules_file(path), generation, path)
+
+
+# ----- Current Rules and Hot Reload -----
+_rules = None
+_rules_mtime = None
+_last_error = None
+_watcher = None
+_lock = threading.Lock()
+
+
+def current_rules():
+    if _rules is None:
+        with _lock:
+            if _rules is None:
+                start_watcher()
+    return _rules
+
+
+def last_rules_error():
+    return _last_error
+
+
+def reload_rules(path=RULES_PATH):
+    # Returns True when new rules were swapped in
+    global _rules, _rules_mtime, _last_error
+    mtime = os.stat(path).st_mtime_ns
+    if _rules is not None and mtime == _rules_mtime:
+        return False
+    generation = 0 if _rules is None else _rules.generation + 1
+    try:
+        rules = load_rules(path, generation)
+    except Exception as err:
+        # Any failure means a bad file, not a bad program: report it, keep the old rules
+        _last_error = f"{path}: {err}"
+        _rules_mtime = mtime
+        if _rules is None:
+            raise
+        return False
+    _rules, _rules_mtime, _last_error = rules, mtime, None
+    return True
+
+
+def watch_rules(path, interval):
+    global _last_error
+    while True:
+        time.sleep(interval)
+        try:
+            reload_rules(path)
+        except Exception as err:
+            # Editors often replace the file; keep the old rules until it's back.
+            # Nothing may end this loop, or hot reload stops without a word.
+            _last_error = f"{path}: {err}"
+
+
+def start_watcher(path=RULES_PATH, interval=WATCH_INTERVAL):
+    global _watcher
+    reload_rules(path)
+    if _watcher is None:
+        _watcher = threading.Thread(target=watch_rules, args=(path, interval), name="stamina-rules-watcher", daemon=True)
+        _watcher.start()
@@ -0,0 +1,332 @@
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from StaminaMetrics import STATE_SAMPLE_EVERY, Collected, Counter, state_size
+
+# Session lifecycle with bounded memory.  A tab left open keeps its
+# session_state on the server for as long as the websocket stays up, so the
+# calculator's own state (EP, history, candidates, the encounter) is managed
+# here instead of left to Streamlit:
+#
+#   - every session gets a token, kept in its session_state only: never in
+#     the URL, which players share (?snapshot= links), so a token cannot be
+#     handed to another browser;
+#   - a session idle for SESSION_IDLE is spilled: its state is pickled to
+#     SESSION_DIR and dropped from memory;
+#   - a session over SESSION_QUOTA is spilled as soon as it is between
+#     reruns, so it only holds memory while a rerun is using it;
+#   - when all resident sessions together pass SESSION_MEMORY, the least
+#     recently seen are spilled first;
+#   - a session whose tab has closed is dropped, not spilled, along with any
+#     spill file it has;
+#   - spilled state older than SESSION_TTL is deleted.
+#
+# Only a tab that stays open is restored transparently: its spilled state
+# comes back on its next rerun, before the page reads any state.  A record
+# only ever serves the session that created it, so a refresh or a reopened
+# tab is a new session and starts fresh (the page reloads the encounter
+# from its ?snapshot= link).  That is why a closed tab's state is never
+# written out: nothing could read it back.
+# Widget values are written to the spill file but left in memory: they are
+# small and the browser owns them.  Callbacks run before the page does, so
+# a callback reading managed state calls restore_session() first.
+#
+# Spill files are pickles and are only ever read from SESSION_DIR under a
+# token this module generated; do not point SESSION_DIR at a shared folder.
+
+SESSION_DIR = os.environ.get(
+    "STAMINA_SESSION_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stamina_sessions")
+)
+SESSION_IDLE = float(os.environ.get("STAMINA_SESSION_IDLE", 10 * 60))  # seconds without a rerun
+SESSION_TTL = float(os.environ.get("STAMINA_SESSION_TTL", 7 * 24 * 3600))  # seconds a spill is kept
+SESSION_QUOTA = int(os.environ.get("STAMINA_SESSION_QUOTA", 1024 * 1024))  # bytes per session
+SESSION_MEMORY = int(os.environ.get("STAMINA_SESSION_MEMORY", 64 * 1024 * 1024))  # bytes, all sessions
+SWEEP_INTERVAL = 30.0  # seconds between sweeps
+RERUN_GRACE = 5.0  # a session seen this recently may be mid-rerun and is never spilled
+
+TOKEN_KEY = "session_token"
+
+
+class SessionRecord:
+    __slots__ = (
+        "token", "session_id", "state", "state_keys", "widget_keys",
+        "last_seen", "last_seen_wall", "reruns", "state_bytes", "spilled", "lock",
+    )
+
+    def __init__(self, token, session_id):
+        self.token = token
+        self.session_id = session_id  # the session that created the record
+        self.state = None  # the session's SafeSessionState while resident
+        self.state_keys = ()
+        self.widget_keys = ()
+        self.last_seen = time.monotonic()
+        self.last_seen_wall = time.time()
+        self.reruns = 0
+        self.state_bytes = 0
+        self.spilled = False
+        self.lock = threading.Lock()
+
+    def managed(self, state):
+        # key -> value for every managed key the state holds
+        return {key: state[key] for key in (*self.state_keys, *self.widget_keys) if key in state}
+
+
+sessions = {}  # token -> SessionRecord
+_sessions_lock = threading.Lock()
+
+
+# ----- Metrics -----
+spills = Counter("stamina_session_spills_total", "Sessions spilled to disk.", ("reason",))
+restores = Counter("stamina_session_restores_total", "Sessions restored.", ("source",))
+expired = Counter("stamina_session_spills_expired_total", "Spilled sessions deleted after the TTL.")
+closed = Counter("stamina_sessions_closed_total", "Sessions dropped after their tab closed.")
+
+
+def resident_samples(summarize):
+    def collect():
+        yield {}, summarize([record.state_bytes for record in list(sessions.values()) if record.state is not None])
+    return collect
+
+
+Collected("stamina_sessions_resident", "Managed sessions with state in memory.", "gauge", resident_samples(len))
+Collected("stamina_sessions_resident_bytes", "Approximate managed state in memory, summed over sessions.", "gauge",
+          resident_samples(sum))
+
+
+# ----- Spill files -----
+def spill_path(token):
+    return os.path.join(SESSION_DIR, f"{token}.pkl")
+
+
+def write_spill(record, values):
+    # Written next to the target and swapped in; dated to the last rerun so the TTL counts from there
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = spill_path(record.token)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.utime(tmp_path, (record.last_seen_wall, record.last_seen_wall))
+    os.replace(tmp_path, path)
+
+
+def read_spill(token):
+    try:
+        with open(spill_path(token), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def spill(record, reason):
+    # Caller holds record.lock.  If the file cannot be written the session stays in memory.
+    state = record.state
+    if state is None:
+        return
+    try:
+        write_spill(record, record.managed(state))
+    except (OSError, pickle.PicklingError, TypeError) as err:
+        print(f"Session {record.token} not spilled: {err}", file=sys.stderr)
+        return
+    for key in record.state_keys:
+        if key in state:
+            del state[key]
+    record.state = None
+    record.state_bytes = 0
+    record.spilled = True
+    spills.inc(reason)
+
+
+def session_closed(record):
+    # Streamlit keeps a disconnected session for a reconnect for two minutes,
+    # well under SESSION_IDLE, so an idle session it no longer has is gone
+    return runtime.exists() and not runtime.get_instance().is_active_session(record.session_id)
+
+
+def close(record):
+    # Caller holds record.lock.  Drops the record, its state and its spill file.
+    state = record.state
+    if state is not None:
+        for key in record.state_keys:
+            if key in state:
+                del state[key]
+    record.state = None
+    record.state_bytes = 0
+    if record.spilled:
+        try:
+            os.remove(spill_path(record.token))
+        except OSError:
+            pass  # the TTL removes it
+        record.spilled = False
+    with _sessions_lock:
+        sessions.pop(record.token, None)
+    closed.inc()
+
+
+# ----- Sweeping -----
+def sweep(now=None):
+    # Drops closed sessions, spills idle and over-quota ones, then the least
+    # recently seen until the memory budget holds, then drops spills past their TTL
+    now = time.monotonic() if now is None else now
+    with _sessions_lock:
+        records = list(sessions.values())
+
+    resident = []
+    for record in records:
+        with record.lock:
+            idle = now - record.last_seen
+            if idle >= SESSION_IDLE and session_closed(record):
+                close(record)
+                continue
+            if record.state is None:
+                continue
+            if idle >= SESSION_IDLE:
+                spill(record, "idle")
+            elif idle >= RERUN_GRACE and record.state_bytes > SESSION_QUOTA:
+                spill(record, "quota")
+            else:
+                resident.append(record)
+
+    total = sum(record.state_bytes for record in resident)
+    for record in sorted(resident, key=lambda record: record.last_seen):
+        if total <= SESSION_MEMORY:
+            break
+        with record.lock:
+            if record.state is not None and now - record.last_seen >= RERUN_GRACE:
+                total -= record.state_bytes
+                spill(record, "memory")
+
+    expire_spills(now)
+
+
+def expire_spills(now):
+    cutoff = time.time() - SESSION_TTL
+    with _sessions_lock:
+        for token, record in list(sessions.items()):
+            if record.state is None and now - record.last_seen >= SESSION_TTL:
+                del sessions[token]
+    try:
+        names = os.listdir(SESSION_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(SESSION_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                expired.inc()
+        except FileNotFoundError:
+            pass  # restored and rewritten, or removed by another sweep
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_sweeper(interval=SWEEP_INTERVAL):
+    # Safe to call on every rerun; only the first call in a process starts the thread
+    global _sweeper
+    if _sweeper is not None:
+        return _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            def run():
+                while True:
+                    time.sleep(interval)
+                    sweep()
+
+            _sweeper = threading.Thread(target=run, name="stamina-session-sweeper", daemon=True)
+            _sweeper.start()
+    return _sweeper
+
+
+# ----- Per rerun -----
+def new_record(session_id):
+    token = uuid.uuid4().hex
+    with _sessions_lock:
+        record = sessions[token] = SessionRecord(token, session_id)
+    return record
+
+
+def restore(record, state):
+    # Caller holds record.lock.  Fills in the managed keys the state lacks from
+    # the record's spill file; True if anything was restored.
+    if not record.spilled:
+        return False
+    values = read_spill(record.token)
+    if not values:
+        return False
+    for key, value in values.items():
+        if key not in state:
+            state[key] = value
+    restores.inc("disk")
+    return True
+
+
+def attach(record, state):
+    # Caller holds record.lock.  Streamlit wraps a session's state afresh for
+    # every rerun, so the latest wrapper is kept; the state is restored first
+    # if it was spilled.
+    restored = False
+    if record.state is None:
+        restored = restore(record, state)
+        record.spilled = False
+    record.state = state
+    record.last_seen = time.monotonic()
+    record.last_seen_wall = time.time()
+    return restored
+
+
+def session_record(ctx):
+    # This session's record.  A token whose record was created by another
+    # session is never used: this session is forked under a new token.
+    token = ctx.session_state[TOKEN_KEY] if TOKEN_KEY in ctx.session_state else None
+    with _sessions_lock:
+        record = sessions.get(token)
+        if record is None and token is not None:  # expired while the tab stayed open
+            record = sessions[token] = SessionRecord(token, ctx.session_id)
+    if record is None or record.session_id != ctx.session_id:
+        record = new_record(ctx.session_id)
+        ctx.session_state[TOKEN_KEY] = record.token
+    return record
+
+
+def manage_session(state_keys, widget_keys=()):
+    # Call once per rerun with the keys the page keeps in session_state, before
+    # it reads any of them.  Returns the session's record (None outside a server).
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    state = ctx.session_state
+    start_sweeper()
+    if "session" in st.query_params:  # links from before tokens left the URL
+        del st.query_params["session"]
+
+    record = session_record(ctx)
+    with record.lock:
+        record.state_keys = tuple(state_keys)
+        record.widget_keys = tuple(widget_keys)
+        restored = attach(record, state)
+        # Re-measured after a restore too, so a session over its quota is caught again
+        if restored or record.reruns % STATE_SAMPLE_EVERY == 0:
+            record.state_bytes = state_size(record.managed(state))
+        record.reruns += 1
+    return record
+
+
+def restore_session():
+    # For callbacks that read managed state: they run before the page calls manage_session
+    ctx = get_script_run_ctx()
+    if ctx is None or TOKEN_KEY not in ctx.session_state:
+        return
+    record = sessions.get(ctx.session_state[TOKEN_KEY])
+    if record is not None and record.session_id == ctx.session_id:
+        with record.lock:
+            attach(record, ctx.session_state)
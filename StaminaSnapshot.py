@@ -0,0 +1,179 @@
+import base64
+import math
+import struct
+import zlib
+
+from StaminaEngine import Loadout
+
+# Compact binary snapshot of an encounter: loadout, flags, EP, turn count and
+# per-turn history.  The fixed-size header comes first, so current EP and the
+# turn count can be read without touching the loadout or history.
+#
+# Layout (little-endian), version 3:
+#   header   version u8, turn_count u64, current_ep f64
+#   loadout  7 x u16 stats, u16 flag bits, extra_costs f64
+#   history  row count u32, zlib(rows: turn u64, regen f64, cost f64, ep_after f64)
+#
+# Every EP value the calculator can reach fits, so encoding only fails on a
+# non-finite EP or a turn count past u64 (ValueError).  Versions 1 and 2
+# stored the turn count as u32 and EP as i32 quarter EP (version 1 also
+# stats as u8) and history rows without their turn; those codes still load,
+# with their rows taken as the consecutive turns up to the turn count.
+#
+# Codes come from URLs anyone can craft: the history is inflated no further
+# than its stated turn count, a non-finite EP is rejected and a negative one
+# read as 0, and levels are checked against the rules before they reach the
+# sliders (fit_loadout).
+
+SNAPSHOT_VERSION = 3
+
+VERSION = struct.Struct("<B")
+HEADER = struct.Struct("<BQd")
+LOADOUT = struct.Struct("<7HHd")
+HISTORY_ROW = struct.Struct("<Q3d")
+# version -> (header, loadout, history row, EP units per stored unit)
+FORMATS = {
+    1: (struct.Struct("<BIi"), struct.Struct("<7BHd"), struct.Struct("<3i"), 0.25),
+    2: (struct.Struct("<BIi"), LOADOUT, struct.Struct("<3i"), 0.25),
+    3: (HEADER, LOADOUT, HISTORY_ROW, 1.0),
+}
+HISTORY_COUNT = struct.Struct("<I")
+MAX_HISTORY_TURNS = 10000  # the page keeps far fewer; this only bounds what a code can claim
+
+STAT_FIELDS = ("endurance", "power1", "power2", "range_stat", "control", "mobility_stat", "buff_debuff")
+FLAG_FIELDS = (
+    "power1_inactive", "power2_inactive", "range_inactive", "control_inactive", "mobility_inactive",
+    "upkeep1", "upkeep2", "upkeep_buff", "deactivated_regen",
+)
+
+
+# ----- Encoding -----
+def encode_snapshot(loadout, current_ep, turn_count, history=()):
+    # history is an iterable of (turn, regen_amount, total_cost, ep_after)
+    # rows; one row can cover many turns (Advance Turns, a rest)
+    flags = 0
+    for bit, field in enumerate(FLAG_FIELDS):
+        if getattr(loadout, field):
+            flags |= 1 << bit
+
+    history = list(history)
+    values = [value for _, *row in history for value in row]
+    if not all(math.isfinite(value) for value in (current_ep, loadout.extra_costs, *values)):
+        raise ValueError("Snapshot values must be finite")
+    try:
+        data = bytearray(HEADER.pack(SNAPSHOT_VERSION, turn_count, current_ep))
+        data += LOADOUT.pack(*(getattr(loadout, field) for field in STAT_FIELDS), flags, loadout.extra_costs)
+        rows = b"".join(HISTORY_ROW.pack(*row) for row in history)
+    except struct.error as err:
+        raise ValueError(f"Snapshot values out of range: {err}")
+
+    data += HISTORY_COUNT.pack(len(history))
+    if rows:
+        data += zlib.compress(rows, 9)
+    return bytes(data)
+
+
+def snapshot_to_text(data):
+    # URL-safe, unpadded: fits in a query string, URL fragment or chat message
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def snapshot_from_text(text):
+    text = text.strip()
+    try:
+        return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    except ValueError:
+        raise ValueError("Snapshot code is not valid")
+
+
+# ----- Decoding -----
+def snapshot_format(data):
+    if len(data) < VERSION.size:
+        raise ValueError("Snapshot is too short")
+    (version,) = VERSION.unpack_from(data, 0)
+    if version not in FORMATS:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    return FORMATS[version]
+
+
+def read_header(data):
+    header, _, _, unit = snapshot_format(data)
+    if len(data) < header.size:
+        raise ValueError("Snapshot is too short")
+    _, turn_count, current_ep = header.unpack_from(data, 0)
+    # EP never goes below 0 in play, and the Current EP input starts at 0
+    if not math.isfinite(current_ep):
+        raise ValueError("Snapshot EP is not a number")
+    return turn_count, max(current_ep * unit, 0.0)
+
+
+def read_current_ep(data):
+    return read_header(data)[1]
+
+
+def read_loadout(data):
+    header, loadout, _, _ = snapshot_format(data)
+    if len(data) < header.size + loadout.size:
+        raise ValueError("Snapshot is too short")
+    values = loadout.unpack_from(data, header.size)
+    fields = dict(zip(STAT_FIELDS, values[:7]))
+    for bit, field in enumerate(FLAG_FIELDS):
+        fields[field] = bool(values[7] >> bit & 1)
+    fields["extra_costs"] = values[8]
+    if not math.isfinite(fields["extra_costs"]):
+        raise ValueError("Snapshot extra costs are not a number")
+    return Loadout(**fields)
+
+
+def fit_loadout(loadout, rules):
+    # Levels above the rules' caps (a crafted code, or a rules file that
+    # lowered a cap since the code was made) are lowered to the cap.
+    # Returns the loadout and the fields that were changed.
+    caps = {field: rules.max_stat for field in STAT_FIELDS}
+    caps.update(endurance=rules.max_endurance, buff_debuff=rules.max_buff)
+    changes = {field: cap for field, cap in caps.items() if getattr(loadout, field) > cap}
+    return loadout._replace(**changes), list(changes)
+
+
+def read_history(data):
+    header, loadout, row, unit = snapshot_format(data)
+    offset = header.size + loadout.size
+    if len(data) < offset + HISTORY_COUNT.size:
+        raise ValueError("Snapshot is too short")
+    (count,) = HISTORY_COUNT.unpack_from(data, offset)
+    if count == 0:
+        return []
+    if count > MAX_HISTORY_TURNS:
+        raise ValueError(f"Snapshot history is longer than {MAX_HISTORY_TURNS} turns")
+    # Inflated no further than the stated turns; anything past them means a bad code
+    size = count * row.size
+    inflater = zlib.decompressobj()
+    try:
+        raw = inflater.decompress(data[offset + HISTORY_COUNT.size:], size)
+        # Stopping at `size` can leave the stream's checksum unread, but no more rows
+        if not inflater.eof and inflater.decompress(inflater.unconsumed_tail, 1):
+            raise ValueError("Snapshot history is longer than its turn count")
+    except zlib.error:
+        raise ValueError("Snapshot history is corrupt")
+    if len(raw) != size or not inflater.eof or inflater.unused_data:
+        raise ValueError("Snapshot history is corrupt")
+    if row is HISTORY_ROW:
+        rows = list(row.iter_unpack(raw))
+    else:
+        first_turn = read_header(data)[0] - count + 1
+        rows = [
+            (first_turn + i, *(value * unit for value in values)) for i, values in enumerate(row.iter_unpack(raw))
+        ]
+    if not all(math.isfinite(value) for _, *values in rows for value in values):
+        raise ValueError("Snapshot history is not a number")
+    return rows
+
+
+def decode_snapshot(data):
+    turn_count, current_ep = read_header(data)
+    return {
+        "turn_count": turn_count,
+        "current_ep": current_ep,
+        "loadout": read_loadout(data),
+        "history": read_history(data),
+    }
@@ -1,23 +1,25 @@
 import streamlit as st
 
-# Mapping tables
-ENDURANCE_TO_MAX_EP = {
-    i: 20 + i * 10 for i in range(14)
-}
+from StaminaAfford import bisect_highest
+from StaminaRules import current_rules
 
-POWER_TO_EP_COST = {
-    0: 1, 1: 1, 2: 2, 3: 3, 4: 4,
-    5: 5, 6: 7, 7: 9, 8: 11, 9: 14,
-    10: 17, 11: 20, 12: 23, 13: 26
-}
+# Mapping tables (from stamina_rules.toml)
+rules = current_rules()
+ENDURANCE_TO_MAX_EP = rules.endurance_to_max_ep
+
+POWER_TO_EP_COST = rules.ep_cost
+
+# Slider ranges follow the tables in the rules file
+MAX_ENDURANCE = len(ENDURANCE_TO_MAX_EP.table) - 1
+MAX_POWER = len(POWER_TO_EP_COST.table) - 1
 
 # Streamlit UI
 st.title("TTRPG Stamina Calculator")
 
 st.sidebar.header("Input Stats")
 
-endurance = st.sidebar.slider("Endurance Stat", 0, 13, 5)
-power = st.sidebar.slider("Power Use Stat", 0, 13, 4)
+endurance = st.sidebar.slider("Endurance Stat", 0, MAX_ENDURANCE, 5)
+power = st.sidebar.slider("Power Use Stat", 0, MAX_POWER, 4)
 num_uses = st.sidebar.number_input("Number of Uses", min_value=1, value=1, step=1)
 
 # Calculation
@@ -38,11 +40,17 @@ if remaining_ep < 0:
 else:
     st.success("✅ You have enough stamina!")
 
-# Optional: Bar chart
+# Inverse: most uses at this Power, and highest Power for this many uses (costs only rise with Power)
+# A Power that costs nothing per use has no limit on uses
+max_uses = max_ep // ep_per_use if ep_per_use > 0 else None
+max_power = bisect_highest(lambda level: POWER_TO_EP_COST[level] * num_uses <= max_ep, 0, MAX_POWER)
+st.write(f"**Max Affordable Uses** (Power {power}): {'no limit' if max_uses is None else max_uses}")
+st.write(f"**Max Affordable Power** ({num_uses} uses): {'none' if max_power is None else max_power}")
+
+# Optional: EP over successive uses (stops once EP runs out)
 st.subheader("EP Usage Overview")
-st.bar_chart({
-    "EP": {
-        "Used": total_cost if remaining_ep > 0 else max_ep,
-        "Remaining": remaining_ep if remaining_ep > 0 else 0
-    }
-})
+uses_shown = num_uses if max_uses is None else min(num_uses, -(-max_ep // ep_per_use))
+st.line_chart({
+    "Use": list(range(uses_shown + 1)),
+    "EP": [max(max_ep - use * ep_per_use, 0) for use in range(uses_shown + 1)]
+}, x="Use", y="EP")
@@ -1,11 +1,15 @@
 import streamlit as st
 import math
 
+from StaminaRules import current_rules
+
 # ----- Data Tables -----
-EP_COST_TABLE = [1, 1, 2, 3, 4, 5, 7, 9, 11, 14, 17, 20, 23, 26]
-CONTROL_REDUCTION_TABLE = [i * 0.5 for i in range(14)]
-BUFF_DEBUFF_TABLE = [i * 3 for i in range(19)]
-ENDURANCE_TO_MAX_EP = [20 + i * 10 for i in range(14)]
+# Loaded from stamina_rules.toml; edits there apply on the next rerun
+rules = current_rules()
+EP_COST_TABLE = rules.ep_cost
+CONTROL_REDUCTION_TABLE = rules.control_reduction
+BUFF_DEBUFF_TABLE = rules.buff_debuff
+ENDURANCE_TO_MAX_EP = rules.endurance_to_max_ep
 
 # ----- Session State Initialization -----
 if "current_ep" not in st.session_state:
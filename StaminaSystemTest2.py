@@ -1,19 +1,14 @@
 import streamlit as st
 
-# Lookup tables
-EP_COST_TABLE = {
-    0: 1, 1: 1, 2: 2, 3: 3, 4: 4,
-    5: 5, 6: 7, 7: 9, 8: 11, 9: 14,
-    10: 17, 11: 20, 12: 23, 13: 26
-}
+from StaminaRules import current_rules
 
-CONTROL_REDUCTION_TABLE = {
-    i: i * 0.5 for i in range(14)
-}
+# Lookup tables (from stamina_rules.toml)
+rules = current_rules()
+EP_COST_TABLE = rules.ep_cost
 
-ENDURANCE_TO_MAX_EP = {
-    i: 20 + i * 10 for i in range(14)
-}
+CONTROL_REDUCTION_TABLE = rules.control_reduction
+
+ENDURANCE_TO_MAX_EP = rules.endurance_to_max_ep
 
 # UI
 st.title("TTRPG Stamina Calculator")
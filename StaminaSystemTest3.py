@@ -1,15 +1,21 @@
 import streamlit as st
 import math
 
+from StaminaHistory import history_chart, init_history, record_turn
+from StaminaRules import current_rules
+
 # ----- Data Tables -----
-EP_COST_TABLE = [1, 1, 2, 3, 4, 5, 7, 9, 11, 14, 17, 20, 23, 26]
-CONTROL_REDUCTION_TABLE = [i * 0.5 for i in range(14)]
-BUFF_DEBUFF_TABLE = [i * 3 for i in range(19)]
-ENDURANCE_TO_MAX_EP = [20 + i * 10 for i in range(14)]
+# Loaded from stamina_rules.toml; edits there apply on the next rerun
+rules = current_rules()
+EP_COST_TABLE = rules.ep_cost
+CONTROL_REDUCTION_TABLE = rules.control_reduction
+BUFF_DEBUFF_TABLE = rules.buff_debuff
+ENDURANCE_TO_MAX_EP = rules.endurance_to_max_ep
 
 # ----- Session State Initialization -----
 if "current_ep" not in st.session_state:
     st.session_state.current_ep = 70  # default starting value
+init_history(st.session_state.current_ep)
 
 # ----- Title -----
 st.title("TTRPG Stamina Calculator")
@@ -55,6 +61,7 @@ st.sidebar.header("Turn Management")
 starting_ep = st.sidebar.number_input("Current EP", min_value=0, value=st.session_state.current_ep, step=1)
 if st.sidebar.button("Next Turn"):
     st.session_state.current_ep = starting_ep
+    record_turn(starting_ep)
 
 # ----- Max EP -----
 max_ep = ENDURANCE_TO_MAX_EP[endurance]
@@ -80,10 +87,5 @@ else:
     st.success("✅ EP is sufficient for this action.")
 
 # ----- Visualization -----
-st.subheader("EP Usage Chart")
-st.bar_chart({
-    "EP": {
-        "Used": total_cost if remaining_ep > 0 else starting_ep,
-        "Remaining": max(remaining_ep, 0)
-    }
-})
+st.subheader("EP History")
+history_chart()
@@ -1,17 +1,23 @@
 import streamlit as st
 import math
 
+from StaminaHistory import history_chart, init_history, record_turn
+from StaminaRules import current_rules
+
 # ----- Data Tables -----
-EP_COST_TABLE = [1, 1, 2, 3, 4, 5, 7, 9, 11, 14, 17, 20, 23, 26]
-CONTROL_REDUCTION_TABLE = [i * 0.5 for i in range(14)]
-BUFF_DEBUFF_TABLE = [i * 3 for i in range(19)]
-ENDURANCE_TO_MAX_EP = [20 + i * 10 for i in range(14)]
+# Loaded from stamina_rules.toml; edits there apply on the next rerun
+rules = current_rules()
+EP_COST_TABLE = rules.ep_cost
+CONTROL_REDUCTION_TABLE = rules.control_reduction
+BUFF_DEBUFF_TABLE = rules.buff_debuff
+ENDURANCE_TO_MAX_EP = rules.endurance_to_max_ep
 
 # ----- Session State Initialization -----
 if "current_ep" not in st.session_state:
     st.session_state.current_ep = 70  # default starting EP
 if "turn_count" not in st.session_state:
     st.session_state.turn_count = 1  # start at turn 1
+init_history(st.session_state.current_ep, st.session_state.turn_count)
 
 st.title("TTRPG Stamina Calculator")
 
@@ -108,6 +114,7 @@ if st.sidebar.button("Next Turn"):
         new_ep = 0
     st.session_state.current_ep = new_ep
     st.session_state.turn_count += 1
+    record_turn(new_ep, st.session_state.turn_count, regen_amount, total_cost)
 
 remaining_ep = st.session_state.current_ep - total_cost
 
@@ -141,10 +148,5 @@ else:
     st.success("✅ EP is sufficient for this action.")
 
 # ----- Visualization -----
-st.subheader("EP Usage Chart")
-st.bar_chart({
-    "EP": {
-        "Used": total_cost if remaining_ep >= 0 else st.session_state.current_ep,
-        "Remaining": max(remaining_ep, 0)
-    }
-})
+st.subheader("EP History")
+history_chart()
@@ -0,0 +1,176 @@
+import atexit
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# Per-turn trace spans, so a disputed EP total can be replayed from what the
+# calculator actually saw.  Each Next Turn (or Advance Turns) emits one span
+# with the loadout, the regen decision, the cost and the EP before and after
+# each clamp.
+#
+# Emitting is a put on an unbounded queue; a writer thread turns spans into
+# JSON lines and appends them in batches, so the click never waits on disk.
+# The log rotates by size: stamina_trace.log, stamina_trace.log.1, ... with
+# the oldest dropped.
+#
+#   python StaminaTrace.py [--trace ID] [--last N]    (print recorded spans)
+
+TRACE_PATH = os.environ.get(
+    "STAMINA_TRACE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "stamina_trace.log"),
+)
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+FLUSH_INTERVAL = 1.0  # seconds the writer waits for more spans before writing
+
+span_ids = itertools.count(1)
+
+
+class SpanWriter(threading.Thread):
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        super().__init__(name="stamina-trace-writer", daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.spans = queue.SimpleQueue()
+        self.dropped = 0
+
+    def run(self):
+        while True:
+            # Collect for up to FLUSH_INTERVAL after the first span, or until a flush() request
+            batch = []
+            item = self.spans.get()
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while not isinstance(item, threading.Event):
+                batch.append(item)
+                try:
+                    item = self.spans.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = None
+                    break
+            if batch:
+                self.write(batch)
+            if item is not None:
+                item.set()
+
+    def write(self, batch):
+        lines = []
+        for span in batch:
+            try:
+                line = json.dumps(span_record(*span), separators=(",", ":"), default=plain_value)
+                lines.append((line + "\n").encode("utf-8"))
+            except (TypeError, ValueError) as err:
+                # One bad attribute loses that span, not the writer thread
+                self.dropped += 1
+                print(f"Trace span {span[0]} dropped ({self.dropped} so far): {err}", file=sys.stderr)
+        if not lines:
+            return
+        try:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            f = open(self.path, "ab")
+            try:
+                for line in lines:
+                    if size and size + len(line) > self.max_bytes:
+                        f.close()
+                        self.rotate()
+                        f = open(self.path, "ab")
+                        size = 0
+                    f.write(line)
+                    size += len(line)
+            finally:
+                f.close()
+        except OSError as err:
+            # Tracing must never take the calculator down; count and report the loss
+            self.dropped += len(lines)
+            print(f"Trace spans dropped ({self.dropped} so far): {err}", file=sys.stderr)
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self, timeout=5.0):
+        # Blocks until everything emitted so far is on disk
+        event = threading.Event()
+        self.spans.put(event)
+        return event.wait(timeout)
+
+
+def plain_value(value):
+    # numpy scalars (from the engine's array paths) as the Python numbers they hold
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def span_record(name, trace_id, span_id, started_ns, duration_ns, loadout, attributes):
+    return {
+        "name": name,
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(started_ns // 10 ** 9))
+                 + f".{started_ns % 10 ** 9 // 1000:06d}Z",
+        "duration_us": duration_ns / 1000,
+        "loadout": loadout._asdict(),
+        **attributes,
+    }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def trace_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = SpanWriter()
+                writer.start()
+                atexit.register(writer.flush)
+                _writer = writer
+    return _writer
+
+
+def emit_span(name, trace_id, started_ns, duration_ns, loadout, **attributes):
+    # started_ns is wall-clock time.time_ns(); the loadout is an immutable
+    # Loadout, so it is safe to serialize later on the writer thread
+    span_id = f"{os.getpid():x}-{next(span_ids):x}"
+    trace_writer().spans.put((name, trace_id, span_id, started_ns, duration_ns, loadout, attributes))
+    return span_id
+
+
+# ----- Reading -----
+def read_spans(path=TRACE_PATH, backups=TRACE_BACKUPS):
+    # Oldest file first, so spans come out in the order they were written
+    for i in range(backups, -1, -1):
+        name = f"{path}.{i}" if i else path
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print recorded turn spans")
+    parser.add_argument("--path", default=TRACE_PATH)
+    parser.add_argument("--trace", help="only spans from this session's trace id")
+    parser.add_argument("--last", type=int, default=20, help="how many of the latest spans to show")
+    args = parser.parse_args()
+
+    spans = [span for span in read_spans(args.path) if args.trace is None or span["trace_id"] == args.trace]
+    for span in spans[-args.last:]:
+        print(json.dumps(span, indent=2))
@@ -0,0 +1,288 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from StaminaEngine import DEFAULT_LOADOUT, LOADOUT_FIELDS, RULE_PROFILES, Loadout, compute_breakdown, max_ep_for, next_turn
+from StaminaPlan import turn_loadouts
+
+# How each calculator script would have priced one scenario: a loadout and
+# a turn sequence (a plan, as in Encounter Plans).  The scripts disagree on
+# control reduction, mobility halving, upkeep and rounding; this runs every
+# one of them on the same turns and lines their numbers up against the
+# engine's rule profiles.
+#
+# A script is run as it is, headless: Streamlit's AppTest sets its sidebar
+# widgets to each turn's loadout, presses Next Turn, and reads back the
+# costs it wrote and the EP it kept in session state.  Each script runs in
+# its own worker process.  A script that does not compile here, or that has
+# no widget for an input the scenario sets, is reported rather than skipped.
+#
+#   python StaminaVariants.py [--plan "turns 1-3: Power Use 1 at 6 with upkeep"] [--turns 4]
+#       [--power1 6 --upkeep1 ...] [--current-ep 70] [--baseline engine:anthesis] [--csv out.csv]
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIANT_SCRIPTS = (
+    "StaminaSystemFinale.py", "StaminaSystemFinale2.py", "StaminaSystemFinale3.py",
+    "StaminaSystemFinale4.py", "StaminaSystemFinale5.py", "StaminaSystemFinal.py",
+    "StaminaSystemFD1.py", "StaminaSystemFD2.py",
+    "StaminaSystemTest4.py", "StaminaSystemTest5.py", "StaminaSystemTest6.py",
+    "AnthesisEpCalculator.py", "AnthesisFinal.py", "AnthesisFinale.py",
+    "AnthesisFinaleBUTFORREALTHISTIME.py", "AnthesisFinaleBUTFORREALTHISTIMEIPROMISE.py",
+    "AnthesisFinaleBUTFORREALTHISTIMEIPROMISEVERSION2.py",
+)
+DEFAULT_BASELINE = "engine:anthesis"
+
+# Loadout field -> (widget type, how it is found, label prefixes or key)
+WIDGETS = {
+    "endurance": ("slider", "label", ("Endurance",)),
+    "power1": ("slider", "label", ("Power Use 1",)),
+    "power1_inactive": ("checkbox", "key", "inactive_Power Use 1"),
+    "power2": ("slider", "label", ("Power Use 2",)),
+    "power2_inactive": ("checkbox", "key", "inactive_Power Use 2"),
+    "range_stat": ("slider", "label", ("Range",)),
+    "range_inactive": ("checkbox", "key", "inactive_Range"),
+    "control": ("slider", "label", ("Control",)),
+    "control_inactive": ("checkbox", "key", "inactive_Control"),
+    "mobility_stat": ("slider", "label", ("Mobility",)),
+    "mobility_inactive": ("checkbox", "key", "inactive_Mobility"),
+    "buff_debuff": ("slider", "label", ("Stat Buff/Debuff",)),
+    "extra_costs": ("number_input", "label", ("Extra Costs",)),
+    "upkeep1": ("checkbox", "label", ("Upkeep for Power Use 1", "Upkeep (halve Power Use 1")),
+    "upkeep2": ("checkbox", "label", ("Upkeep for Power Use 2",)),
+    "upkeep_buff": ("checkbox", "label", ("Upkeep for Buff/Debuff",)),
+    "deactivated_regen": ("checkbox", "label", ("Deactivated Regen",)),
+}
+
+# Breakdown line -> engine breakdown key, for the turn 1 comparison
+COMPONENTS = {
+    "Power Use 1 Cost": "ep_power1",
+    "Power Use 2 Cost": "ep_power2",
+    "Range Cost": "ep_range",
+    "Mobility Cost": "ep_mobility",
+    "Buff/Debuff Cost": "buff_debuff_cost",
+    "Control Reduction": "control_reduction",
+    "Total EP Cost": "total_cost",
+}
+# "**Range Cost** (Inactive: False): 2" and "| **Range Cost** | Inactive: False | 2 |" alike
+COMPONENT_RE = re.compile(r"\*\*(" + "|".join(map(re.escape, COMPONENTS)) + r")[^*]*\*\*.*?(-?\d+(?:\.\d+)?)\s*\|?\s*$")
+
+
+# ----- Scenario -----
+def scenario_turns(base=DEFAULT_LOADOUT, plan="", turns=None):
+    # One loadout per turn; without a plan, `turns` turns of the base loadout
+    if plan.strip():
+        return turn_loadouts(plan, base, turns)
+    return [base] * (turns or 1)
+
+
+# ----- Running a script -----
+def find_widget(at, kind, how, target):
+    for widget in getattr(at.sidebar, kind):
+        if widget.key == target if how == "key" else (widget.label or "").startswith(target):
+            return widget
+    return None
+
+
+def set_loadout(at, loadout):
+    # Puts the loadout into the script's widgets; returns the fields it cannot
+    # take (no widget, or a value outside the widget's range) that differ from the default
+    unsupported = []
+    for field, (kind, how, target) in WIDGETS.items():
+        value = getattr(loadout, field)
+        widget = find_widget(at, kind, how, target)
+        in_range = widget is not None and (
+            kind == "checkbox"
+            or (widget.min is None or value >= widget.min) and (widget.max is None or value <= widget.max)
+        )
+        if in_range:
+            widget.set_value(float(value) if kind == "number_input" else value)
+        elif value != getattr(DEFAULT_LOADOUT, field):
+            unsupported.append(field)
+    return unsupported
+
+
+def read_breakdown(at):
+    # Breakdown line -> value, from everything the script wrote
+    values = {}
+    for element in at.markdown:
+        for line in element.value.splitlines():
+            match = COMPONENT_RE.search(line)
+            if match and match.group(1) not in values:
+                values[match.group(1)] = float(match.group(2))
+    return values
+
+
+def press_next_turn(at):
+    button = next((button for button in at.sidebar.button if button.label == "Next Turn"), None)
+    if button is None:
+        raise ValueError("no Next Turn button")
+    button.click()
+
+
+def run_variant(job):
+    # Worker: the scenario through one script.  Compile and runtime errors are
+    # part of the result, since a variant that fails is an answer too.
+    script, loadouts, current_ep, turn_count = job
+    started = time.perf_counter()
+    result = {"variant": script, "error": None, "unsupported": [], "costs": [], "ep_after": [], "breakdown": {}}
+    main = sys.modules["__main__"]  # AppTest runs the script as __main__; the pool needs ours back
+    try:
+        path = os.path.join(SCRIPT_DIR, script)
+        with open(path, encoding="utf-8") as f:
+            compile(f.read(), path, "exec")
+
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(path, default_timeout=60)
+        at.session_state["current_ep"] = current_ep
+        at.session_state["turn_count"] = turn_count
+        at.run()
+        first_run = time.perf_counter()
+        if at.exception:
+            raise RuntimeError(f"on first load: {at.exception[0].message}")
+        unsupported = set()
+        for turn, loadout in enumerate(loadouts, start=1):
+            unsupported.update(set_loadout(at, loadout))
+            press_next_turn(at)
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"on turn {turn}: {at.exception[0].message}")
+            breakdown = read_breakdown(at)
+            if "Total EP Cost" not in breakdown:
+                raise ValueError("no Total EP Cost in the page")
+            result["breakdown"] = result["breakdown"] or breakdown
+            result["costs"].append(breakdown["Total EP Cost"])
+            result["ep_after"].append(at.session_state["current_ep"])
+        result["unsupported"] = sorted(unsupported, key=LOADOUT_FIELDS.index)
+        result["turn_seconds"] = (time.perf_counter() - first_run) / max(len(loadouts), 1)
+    except Exception as err:  # one broken script must not end the report
+        result["error"] = f"{type(err).__name__}: {str(err).splitlines()[0]}"
+    finally:
+        sys.modules["__main__"] = main
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_engine(profile, loadouts, current_ep, turn_count):
+    # The same scenario priced by StaminaEngine, as a reference row
+    started = time.perf_counter()
+    max_ep = max_ep_for(loadouts[0].endurance)
+    costs, ep_after = [], []
+    ep = current_ep
+    for loadout in loadouts:
+        breakdown = compute_breakdown(loadout, profile)
+        ep, turn_count = next_turn(ep, turn_count, max_ep, breakdown["total_cost"], loadout.deactivated_regen)
+        costs.append(breakdown["total_cost"])
+        ep_after.append(ep)
+        if len(costs) == 1:
+            first = {line: breakdown[key] for line, key in COMPONENTS.items()}
+    seconds = time.perf_counter() - started
+    return {
+        "variant": f"engine:{profile}", "error": None, "unsupported": [], "costs": costs, "ep_after": ep_after,
+        "breakdown": first, "seconds": seconds, "turn_seconds": seconds / len(loadouts),
+    }
+
+
+def init_worker():
+    # Scripts that serve metrics or write trace spans do neither during a comparison
+    os.environ["STAMINA_METRICS_PORT"] = "0"
+    os.environ["STAMINA_TRACE"] = os.devnull
+    # Their exceptions are reported in the table, not logged with a traceback
+    from streamlit import config, logger
+
+    config.set_option("logger.level", "critical")
+    logger.set_log_level("critical")
+
+
+def compare_variants(loadouts, current_ep=None, turn_count=1, scripts=VARIANT_SCRIPTS, workers=None):
+    if current_ep is None:
+        current_ep = max_ep_for(loadouts[0].endurance)
+    jobs = [(script, loadouts, current_ep, turn_count) for script in scripts]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        results = list(pool.map(run_variant, jobs))
+    return [run_engine(profile, loadouts, current_ep, turn_count) for profile in RULE_PROFILES] + results
+
+
+# ----- Report -----
+def diff_rows(results, baseline=DEFAULT_BASELINE):
+    # One row per variant: turn 1 breakdown, per-turn costs and how they differ from the baseline
+    reference = next((result for result in results if result["variant"] == baseline and not result["error"]), None)
+    for result in results:
+        row = {"Variant": result["variant"]}
+        if result["error"]:
+            row["Status"] = f"failed: {result['error']}"
+        elif result["unsupported"]:
+            row["Status"] = "no input for " + ", ".join(result["unsupported"])
+        else:
+            row["Status"] = "ok"
+        for line in COMPONENTS:
+            row[line] = result["breakdown"].get(line, "")
+        row["Turn Costs"] = " ".join(f"{cost:g}" for cost in result["costs"])
+        row["EP Spent"] = sum(result["costs"]) if not result["error"] else ""
+        row["Final EP"] = result["ep_after"][-1] if result["ep_after"] and not result["error"] else ""
+        row["Spent vs Baseline"] = row["Turns Differing"] = ""
+        if reference is not None:
+            if not result["error"]:
+                row["Spent vs Baseline"] = row["EP Spent"] - sum(reference["costs"])
+            # A script that failed part way is still compared on the turns it priced
+            row["Turns Differing"] = " ".join(
+                str(turn) for turn, (cost, expected) in enumerate(zip(result["costs"], reference["costs"]), start=1)
+                if cost != expected
+            ) or ("-" if result["costs"] else "")
+        row["Seconds"] = round(result["seconds"], 4)
+        row["ms per Turn"] = round(result["turn_seconds"] * 1000, 2) if "turn_seconds" in result else ""
+        yield row
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_table(rows):
+    # Status goes on its own line below the numbers; error messages are long
+    columns = [name for name in rows[0] if name != "Status"]
+    widths = {name: max(len(name), *(len(f"{row[name]:g}" if isinstance(row[name], float) else str(row[name])) for row in rows)) for name in columns}
+    print("  ".join(name.rjust(widths[name]) for name in columns))
+    for row in rows:
+        print("  ".join(
+            (f"{row[name]:g}" if isinstance(row[name], float) else str(row[name])).rjust(widths[name]) for name in columns
+        ))
+        if row["Status"] != "ok":
+            print(f"    {row['Status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price one scenario with every calculator script and diff the results")
+    parser.add_argument("--plan", default="", help="turn sequence, e.g. 'turns 1-3: Power Use 1 at 6 with upkeep'")
+    parser.add_argument("--turns", type=int, help="number of turns (default: the plan's last turn, or 1)")
+    parser.add_argument("--current-ep", type=float, help="EP before turn 1 (default: max EP)")
+    parser.add_argument("--turn", type=int, default=1, help="turn count before the first turn, for regen parity")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="variant the others are diffed against")
+    parser.add_argument("--scripts", help="comma-separated scripts (default: every calculator script)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--csv", help="also write the diff table to this CSV file")
+    for field, default in DEFAULT_LOADOUT._asdict().items():
+        option = "--" + field.replace("_", "-")
+        if isinstance(default, bool):
+            parser.add_argument(option, action="store_true")
+        else:
+            parser.add_argument(option, type=type(default), default=default)
+    args = parser.parse_args()
+
+    base = Loadout(**{field: getattr(args, field) for field in LOADOUT_FIELDS})
+    loadouts = scenario_turns(base, args.plan, args.turns)
+    scripts = args.scripts.split(",") if args.scripts else VARIANT_SCRIPTS
+    started = time.perf_counter()
+    rows = list(diff_rows(compare_variants(loadouts, args.current_ep, args.turn, scripts, args.workers), args.baseline))
+    print_table(rows)
+    print(f"{len(scripts)} scripts over {len(loadouts)} turns in {time.perf_counter() - started:.1f} s")
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"Wrote {args.csv}")
@@ -0,0 +1,153 @@
+import importlib
+import os
+import sys
+import time
+
+from StaminaCache import cache_stats, cached_breakdown
+from StaminaCompare import compare_loadouts
+from StaminaCostSpace import load_cost_space
+from StaminaDistribution import dice_distribution, ep_distributions
+from StaminaEngine import DEFAULT_LOADOUT, RULE_PROFILES
+from StaminaFrontier import refresh_frontier
+from StaminaPlan import evaluate_plans
+from StaminaPlugins import load_plugins
+from StaminaRules import current_rules
+
+# Server start with the lazy work done up front.  Without it the first
+# session after a deploy pays for importing the chart and dataframe
+# libraries, loading the rules file, mapping the cost space and filling the
+# breakdown cache, and its first page load is several times slower than
+# every later one.
+#
+#   python StaminaWarmup.py [APP] [streamlit run options...]
+#
+# Warms up in this process, prints how long each step took, then starts
+# `streamlit run APP` in the same process, so the server inherits the warm
+# modules and caches.  --warmup-only stops after the report.
+
+DEFAULT_APP = "AnthesisFinaleBUTFORREALTHISTIMEIPROMISEVERSION2.py"
+
+# Libraries Streamlit only imports when the first chart or table is drawn
+LAZY_IMPORTS = ("numpy", "pandas", "pyarrow", "altair")
+
+WARMUP_PLAN = "turns 1-3: Power Use 1 at 6 with upkeep; turn 4: Mobility inactive, extra 2.5"
+WARMUP_DICE = "1d6"
+
+
+# ----- Steps -----
+def import_libraries():
+    for name in LAZY_IMPORTS:
+        importlib.import_module(name)
+
+
+def load_rules():
+    current_rules()
+
+
+def map_cost_space():
+    # Builds the file first if it is missing or was built from other rules
+    space = load_cost_space()
+    for profile in RULE_PROFILES:
+        space.total_cost(DEFAULT_LOADOUT, profile)
+
+
+def common_loadouts(rules):
+    # The starting loadout and everything one slider move or one toggle away from it
+    # (DEFAULT_LOADOUT matches the calculator's slider defaults)
+    base = DEFAULT_LOADOUT
+    loadouts = {base}
+    stat_levels = range(min(len(rules.ep_cost.table), rules.max_stat + 1))
+    for field in ("power1", "power2", "range_stat", "control", "mobility_stat"):
+        loadouts.update(base._replace(**{field: level}) for level in stat_levels)
+    loadouts.update(
+        base._replace(buff_debuff=level)
+        for level in range(min(len(rules.buff_debuff.table), rules.max_buff + 1))
+    )
+    loadouts.update(
+        base._replace(endurance=level)
+        for level in range(min(len(rules.endurance_to_max_ep.table), rules.max_endurance + 1))
+    )
+    for field in (
+        "power1_inactive", "power2_inactive", "range_inactive", "control_inactive", "mobility_inactive",
+        "upkeep1", "upkeep2", "upkeep_buff",
+    ):
+        loadouts.add(base._replace(**{field: True}))
+    return sorted(loadouts)
+
+
+def prime_breakdown_cache():
+    loadouts = common_loadouts(current_rules())
+    for profile in RULE_PROFILES:
+        for loadout in loadouts:
+            cached_breakdown(loadout, profile)
+
+
+def prime_evaluators():
+    # First calls of the numpy pricing, plan compiler and dice convolution paths
+    compare_loadouts([DEFAULT_LOADOUT], 70, 1)
+    evaluate_plans([WARMUP_PLAN], base=DEFAULT_LOADOUT)
+    ep_distributions(DEFAULT_LOADOUT, dice_distribution(WARMUP_DICE), 10)
+
+
+def load_frontiers():
+    # Read from disk, or swept and saved if the rules changed since the last build;
+    # the page itself only reads them
+    for profile in RULE_PROFILES:
+        refresh_frontier(profile)
+
+
+def dry_run(app):
+    # One headless run of the page itself, for everything Streamlit sets up
+    # on first use (element serializers, chart specs)
+    from streamlit.testing.v1 import AppTest
+
+    AppTest.from_file(app, default_timeout=60).run()
+
+
+WARMUP_STEPS = (
+    ("Import chart and table libraries", import_libraries),
+    ("Load rules", load_rules),
+    ("Load homebrew plugins", load_plugins),
+    ("Map cost space", map_cost_space),
+    ("Prime breakdown cache", prime_breakdown_cache),
+    ("Prime compare, plan and dice evaluators", prime_evaluators),
+    ("Load build advice frontiers", load_frontiers),
+)
+
+
+def warm_up(app=None):
+    # Returns [(step, seconds)]; the page dry run is only done when an app is given
+    steps = list(WARMUP_STEPS)
+    if app is not None:
+        steps.append(("Dry run of the page", lambda: dry_run(app)))
+    timings = []
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+
+def print_timings(timings):
+    width = max(len(name) for name, _ in timings)
+    for name, seconds in timings:
+        print(f"{name.ljust(width)}  {seconds * 1000:8.1f} ms")
+    print(f"{'Total'.ljust(width)}  {sum(seconds for _, seconds in timings) * 1000:8.1f} ms")
+    stats = cache_stats()
+    print(f"Breakdown cache: {stats['size']} of {stats['maxsize']} entries")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    warmup_only = "--warmup-only" in args
+    if warmup_only:
+        args.remove("--warmup-only")
+    app = os.path.abspath(args.pop(0) if args and not args[0].startswith("-") else DEFAULT_APP)
+
+    print_timings(warm_up(app))
+    sys.stdout.flush()
+    if not warmup_only:
+        from streamlit.web import cli
+
+        sys.argv = ["streamlit", "run", app, *args]
+        sys.exit(cli.main())